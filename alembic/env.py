@@ -5,6 +5,7 @@ from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy.engine import make_url
 
 from alembic import context
 
@@ -29,8 +30,13 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# Every warehouse has its own database. `alembic upgrade head` migrates all of
+# them; `alembic -x warehouse=north upgrade head` migrates just one.
+warehouse = context.get_x_argument(as_dictionary=True).get('warehouse')
+warehouses = [db.resolve_warehouse(warehouse)] if warehouse else db.WAREHOUSES
+
 # Provide the SQLAlchemy URL from our app's config
-config.set_main_option('sqlalchemy.url', db.DATABASE_URL)
+config.set_main_option('sqlalchemy.url', db.database_url(warehouses[0]))
 
 # add your model's MetaData object here for 'autogenerate' support
 target_metadata = SQLModel.metadata
@@ -45,7 +51,7 @@ def run_migrations_offline():
     we don't even need a DBAPI to be available.
 
     Calls to context.execute() here emit the given string to the
-    script output.
+    script output. Offline scripts are written for one warehouse.
     """
     url = config.get_main_option('sqlalchemy.url')
     context.configure(
@@ -65,20 +71,27 @@ def run_migrations_online():
     In this scenario we need to create an Engine
     and associate a connection with the context.
     """
-    connectable = engine_from_config(
-        config.get_section(config.config_ini_section),
-        prefix='sqlalchemy.',
-        poolclass=pool.NullPool,
-    )
-
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=target_metadata,
+    for key in warehouses:
+        url = db.database_url(key)
+        # The app no longer creates the data directory on import
+        os.makedirs(os.path.dirname(make_url(url).database), exist_ok=True)
+
+        section = config.get_section(config.config_ini_section)
+        section['sqlalchemy.url'] = url
+        connectable = engine_from_config(
+            section,
+            prefix='sqlalchemy.',
+            poolclass=pool.NullPool,
         )
 
-        with context.begin_transaction():
-            context.run_migrations()
+        with connectable.connect() as connection:
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+            )
+
+            with context.begin_transaction():
+                context.run_migrations()
 
 
 if context.is_offline_mode():
@@ -13,6 +13,8 @@ from alembic import op
 import sqlalchemy as sa
 import sqlmodel
 
+from backend.data_migration import copy_rows, final_transaction, finish_copies
+
 
 # revision identifiers, used by Alembic.
 revision: str = '137f476c8392'
@@ -21,120 +23,138 @@ branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
 
+def _parts_state(with_category_id: bool):
+    """
+    Where an earlier run of this migration stopped: (parts exists, already
+    swapped). Swapped means the swap committed but the revision wasn't stamped.
+    """
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('parts'):
+        # Dropped by a run from before the swap was transactional;
+        # parts_new holds every row
+        return False, False
+    columns = {column['name'] for column in inspector.get_columns('parts')}
+    return True, ('category_id' in columns) == with_category_id
+
+
+def _has_name_index() -> bool:
+    return 'ix_parts_name' in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('parts')}
+
+
 def upgrade() -> None:
-    # Create the junction table for many-to-many relationship
-    op.create_table('part_categories',
-    sa.Column('part_id', sa.Integer(), nullable=False),
-    sa.Column('category_id', sa.Integer(), nullable=False),
-    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
-    sa.ForeignKeyConstraint(['part_id'], ['parts.id'], ),
-    sa.PrimaryKeyConstraint('part_id', 'category_id')
-    )
+    # The copies below commit in chunks and resume after an interruption, so
+    # everything before them must be safe to run again
+    parts_exists, swapped = _parts_state(with_category_id=False)
     
-    # Migrate existing data from parts.category_id to junction table
-    connection = op.get_bind()
-    
-    # Get all parts with category_id set
-    result = connection.execute(sa.text("SELECT id, category_id FROM parts WHERE category_id IS NOT NULL"))
-    parts_with_categories = result.fetchall()
-    
-    # Insert into junction table
-    for part_id, category_id in parts_with_categories:
-        connection.execute(
-            sa.text("INSERT INTO part_categories (part_id, category_id) VALUES (:part_id, :category_id)"),
-            {"part_id": part_id, "category_id": category_id}
+    if parts_exists and not swapped:
+        # Create the junction table for many-to-many relationship
+        if not sa.inspect(op.get_bind()).has_table('part_categories'):
+            op.create_table('part_categories',
+            sa.Column('part_id', sa.Integer(), nullable=False),
+            sa.Column('category_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+            sa.ForeignKeyConstraint(['part_id'], ['parts.id'], ),
+            sa.PrimaryKeyConstraint('part_id', 'category_id')
+            )
+        
+        # Migrate existing data from parts.category_id to junction table
+        copy_rows(
+            '137f476c8392_part_categories', 'parts', 'part_categories',
+            ['part_id', 'category_id'], select_columns=['id', 'category_id'],
+            where='category_id IS NOT NULL',
         )
-    
-    # For SQLite, we need to recreate the table without the category_id column
-    # This is a workaround for SQLite's limited ALTER TABLE support
-    
-    # Step 1: Create new table without category_id
-    op.execute("""
-        CREATE TABLE parts_new (
-            name VARCHAR(200) NOT NULL,
-            description VARCHAR,
-            quantity INTEGER NOT NULL,
-            part_type VARCHAR(100),
-            specifications VARCHAR,
-            manufacturer VARCHAR(100),
-            model VARCHAR(100),
-            bin_id INTEGER NOT NULL,
-            id INTEGER NOT NULL,
-            created_at DATETIME NOT NULL,
-            updated_at DATETIME NOT NULL,
-            PRIMARY KEY (id),
-            FOREIGN KEY(bin_id) REFERENCES bins (id)
+        
+        # For SQLite, we need to recreate the table without the category_id column
+        # This is a workaround for SQLite's limited ALTER TABLE support
+        
+        # Step 1: Create new table without category_id
+        op.execute("""
+            CREATE TABLE IF NOT EXISTS parts_new (
+                name VARCHAR(200) NOT NULL,
+                description VARCHAR,
+                quantity INTEGER NOT NULL,
+                part_type VARCHAR(100),
+                specifications VARCHAR,
+                manufacturer VARCHAR(100),
+                model VARCHAR(100),
+                bin_id INTEGER NOT NULL,
+                id INTEGER NOT NULL,
+                created_at DATETIME NOT NULL,
+                updated_at DATETIME NOT NULL,
+                PRIMARY KEY (id),
+                FOREIGN KEY(bin_id) REFERENCES bins (id)
+            )
+        """)
+        
+        # Step 2: Copy data (excluding category_id)
+        copy_rows(
+            '137f476c8392_parts', 'parts', 'parts_new',
+            ['name', 'description', 'quantity', 'part_type', 'specifications',
+             'manufacturer', 'model', 'bin_id', 'id', 'created_at', 'updated_at'],
         )
-    """)
     
-    # Step 2: Copy data (excluding category_id)
-    op.execute("""
-        INSERT INTO parts_new (name, description, quantity, part_type, specifications, 
-                              manufacturer, model, bin_id, id, created_at, updated_at)
-        SELECT name, description, quantity, part_type, specifications, 
-               manufacturer, model, bin_id, id, created_at, updated_at
-        FROM parts
-    """)
-    
-    # Step 3: Drop old table and rename new one
-    op.execute("DROP TABLE parts")
-    op.execute("ALTER TABLE parts_new RENAME TO parts")
-    
-    # Step 4: Recreate indexes
-    op.create_index(op.f('ix_parts_name'), 'parts', ['name'], unique=False)
+    with final_transaction():
+        # Step 3: Drop old table and rename new one
+        if not swapped:
+            if parts_exists:
+                op.execute("DROP TABLE parts")
+            op.execute("ALTER TABLE parts_new RENAME TO parts")
+        
+        # Step 4: Recreate indexes
+        if not swapped or not _has_name_index():
+            op.create_index(op.f('ix_parts_name'), 'parts', ['name'], unique=False)
+        finish_copies()
 
 
 def downgrade() -> None:
     # For downgrade, we need to recreate the parts table with category_id
+    parts_exists, swapped = _parts_state(with_category_id=True)
     
-    # Step 1: Create new table with category_id
-    op.execute("""
-        CREATE TABLE parts_new (
-            name VARCHAR(200) NOT NULL,
-            description VARCHAR,
-            quantity INTEGER NOT NULL,
-            part_type VARCHAR(100),
-            specifications VARCHAR,
-            manufacturer VARCHAR(100),
-            model VARCHAR(100),
-            bin_id INTEGER NOT NULL,
-            category_id INTEGER,
-            id INTEGER NOT NULL,
-            created_at DATETIME NOT NULL,
-            updated_at DATETIME NOT NULL,
-            PRIMARY KEY (id),
-            FOREIGN KEY(bin_id) REFERENCES bins (id),
-            FOREIGN KEY(category_id) REFERENCES categories (id)
-        )
-    """)
-    
-    # Step 2: Copy data
-    op.execute("""
-        INSERT INTO parts_new (name, description, quantity, part_type, specifications, 
-                              manufacturer, model, bin_id, id, created_at, updated_at)
-        SELECT name, description, quantity, part_type, specifications, 
-               manufacturer, model, bin_id, id, created_at, updated_at
-        FROM parts
-    """)
-    
-    # Step 3: Migrate data back from junction table (taking first category for each part)
-    connection = op.get_bind()
-    result = connection.execute(sa.text("SELECT part_id, MIN(category_id) as category_id FROM part_categories GROUP BY part_id"))
-    part_categories = result.fetchall()
-    
-    # Update parts table with first category
-    for part_id, category_id in part_categories:
-        connection.execute(
-            sa.text("UPDATE parts_new SET category_id = :category_id WHERE id = :part_id"),
-            {"category_id": category_id, "part_id": part_id}
+    if parts_exists and not swapped:
+        # Step 1: Create new table with category_id
+        op.execute("""
+            CREATE TABLE IF NOT EXISTS parts_new (
+                name VARCHAR(200) NOT NULL,
+                description VARCHAR,
+                quantity INTEGER NOT NULL,
+                part_type VARCHAR(100),
+                specifications VARCHAR,
+                manufacturer VARCHAR(100),
+                model VARCHAR(100),
+                bin_id INTEGER NOT NULL,
+                category_id INTEGER,
+                id INTEGER NOT NULL,
+                created_at DATETIME NOT NULL,
+                updated_at DATETIME NOT NULL,
+                PRIMARY KEY (id),
+                FOREIGN KEY(bin_id) REFERENCES bins (id),
+                FOREIGN KEY(category_id) REFERENCES categories (id)
+            )
+        """)
+        
+        # Step 2: Copy data, migrating back from the junction table (taking the
+        # first category for each part)
+        copy_rows(
+            '137f476c8392_downgrade_parts', 'parts', 'parts_new',
+            ['name', 'description', 'quantity', 'part_type', 'specifications',
+             'manufacturer', 'model', 'bin_id', 'category_id', 'id', 'created_at', 'updated_at'],
+            select_columns=['name', 'description', 'quantity', 'part_type', 'specifications',
+                            'manufacturer', 'model', 'bin_id',
+                            '(SELECT MIN(category_id) FROM part_categories WHERE part_id = parts.id)',
+                            'id', 'created_at', 'updated_at'],
         )
     
-    # Step 4: Drop old table and rename new one
-    op.execute("DROP TABLE parts")
-    op.execute("ALTER TABLE parts_new RENAME TO parts")
-    
-    # Step 5: Recreate indexes
-    op.create_index(op.f('ix_parts_name'), 'parts', ['name'], unique=False)
-    
-    # Step 6: Drop the junction table
-    op.drop_table('part_categories')
+    with final_transaction():
+        # Step 3: Drop old table and rename new one
+        if not swapped:
+            if parts_exists:
+                op.execute("DROP TABLE parts")
+            op.execute("ALTER TABLE parts_new RENAME TO parts")
+        
+        # Step 4: Recreate indexes
+        if not swapped or not _has_name_index():
+            op.create_index(op.f('ix_parts_name'), 'parts', ['name'], unique=False)
+        
+        # Step 5: Drop the junction table
+        op.execute("DROP TABLE IF EXISTS part_categories")
+        finish_copies()
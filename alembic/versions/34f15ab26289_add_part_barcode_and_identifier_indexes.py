@@ -0,0 +1,41 @@
+# A basic script template used by Alembic when autogenerating
+# migration files. Kept minimal to support simple revisions.
+"""add part barcode and identifier indexes
+
+Revision ID: 34f15ab26289
+Revises: 9a538f45b166
+Create Date: 2026-10-19 08:57:52.715114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '34f15ab26289'
+down_revision: Union[str, None] = '9a538f45b166'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Must match backend.database.identifier_key()
+BARCODE_KEY = "upper(replace(replace(barcode, ' ', ''), '-', ''))"
+MODEL_KEY = "upper(replace(replace(model, ' ', ''), '-', ''))"
+
+
+def upgrade() -> None:
+    op.add_column('parts', sa.Column('barcode', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=True))
+    op.create_index('ix_parts_barcode_key', 'parts', [sa.text(BARCODE_KEY)], unique=True)
+    # Normalized model lookups replace the plain model index
+    op.drop_index(op.f('ix_parts_model'), table_name='parts')
+    op.create_index('ix_parts_model_key', 'parts', [sa.text(MODEL_KEY)], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_parts_model_key', table_name='parts')
+    op.create_index(op.f('ix_parts_model'), 'parts', ['model'], unique=False)
+    op.drop_index('ix_parts_barcode_key', table_name='parts')
+    op.drop_column('parts', 'barcode')
@@ -0,0 +1,76 @@
+# A basic script template used by Alembic when autogenerating
+# migration files. Kept minimal to support simple revisions.
+"""add change log
+
+Revision ID: 45cff88eb255
+Revises: 006006cc2134
+Create Date: 2026-10-19 08:53:36.511911
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '45cff88eb255'
+down_revision: Union[str, None] = '006006cc2134'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('change_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity', sqlmodel.sql.sqltypes.AutoString(length=50), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('op', sqlmodel.sql.sqltypes.AutoString(length=10), nullable=False),
+    sa.Column('data', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Seed the log with the current rows so syncing from token 0 yields a
+    # complete copy of the inventory, not just changes made after this point
+    op.execute("""
+        INSERT INTO change_log (entity, entity_id, op, data, changed_at)
+        SELECT 'bin', id, 'upsert',
+               json_object('id', id, 'number', number, 'size', size,
+                           'location', location, 'created_at', created_at),
+               CURRENT_TIMESTAMP
+        FROM bins ORDER BY id
+    """)
+    op.execute("""
+        INSERT INTO change_log (entity, entity_id, op, data, changed_at)
+        SELECT 'category', id, 'upsert',
+               json_object('id', id, 'name', name, 'description', description,
+                           'created_at', created_at),
+               CURRENT_TIMESTAMP
+        FROM categories ORDER BY id
+    """)
+    op.execute("""
+        INSERT INTO change_log (entity, entity_id, op, data, changed_at)
+        SELECT 'part', p.id, 'upsert',
+               json_object('id', p.id, 'name', p.name, 'quantity', p.quantity,
+                           'part_type', p.part_type, 'specifications', p.specifications,
+                           'manufacturer', p.manufacturer, 'model', p.model,
+                           'bin_id', p.bin_id, 'created_at', p.created_at,
+                           'updated_at', p.updated_at,
+                           'category_ids', (SELECT json_group_array(pc.category_id)
+                                            FROM part_categories pc WHERE pc.part_id = p.id)),
+               CURRENT_TIMESTAMP
+        FROM parts p ORDER BY p.id
+    """)
+    op.execute("""
+        INSERT INTO change_log (entity, entity_id, op, data, changed_at)
+        SELECT 'part_category', part_id, 'upsert',
+               json_object('part_id', part_id, 'category_id', category_id),
+               CURRENT_TIMESTAMP
+        FROM part_categories ORDER BY part_id, category_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('change_log')
@@ -0,0 +1,80 @@
+# A basic script template used by Alembic when autogenerating
+# migration files. Kept minimal to support simple revisions.
+"""add part dedup key and import runs
+
+Revision ID: 882a01186d12
+Revises: 34f15ab26289
+Create Date: 2026-10-19 09:01:58.883602
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import logging
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '882a01186d12'
+down_revision: Union[str, None] = '34f15ab26289'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+# Must match backend.database.dedup_key_columns()
+DEDUP_KEY = [
+    "lower(trim(name))",
+    "lower(trim(coalesce(manufacturer, '')))",
+    "lower(trim(coalesce(model, '')))",
+    "bin_id",
+]
+
+
+def upgrade() -> None:
+    # Existing duplicates would block the unique index. Keep the oldest part
+    # of each group as is and tag the others by id so they can be merged by hand;
+    # every renamed part is logged and gets a change log entry.
+    duplicates = f"""
+        SELECT id FROM parts
+        WHERE id NOT IN (SELECT MIN(id) FROM parts GROUP BY {', '.join(DEDUP_KEY)})
+    """
+    if not op.get_context().as_sql:
+        renamed = op.get_bind().execute(sa.text(f"""
+            SELECT id, name, kept_id FROM (
+                SELECT id, name, MIN(id) OVER (PARTITION BY {', '.join(DEDUP_KEY)}) AS kept_id FROM parts
+            ) WHERE id != kept_id ORDER BY id
+        """)).all()
+        for part_id, name, kept_id in renamed:
+            logger.warning("Renaming part %d %r to %r: duplicate of part %d",
+                           part_id, name, f"{name} (duplicate {part_id})", kept_id)
+    op.execute(f"UPDATE parts SET name = name || ' (duplicate ' || id || ')' WHERE id IN ({duplicates})")
+    op.execute("""
+        INSERT INTO change_log (entity, entity_id, op, data, changed_at)
+        SELECT 'part', p.id, 'upsert',
+               json_object('id', p.id, 'name', p.name, 'quantity', p.quantity,
+                           'part_type', p.part_type, 'specifications', p.specifications,
+                           'manufacturer', p.manufacturer, 'model', p.model,
+                           'barcode', p.barcode, 'bin_id', p.bin_id,
+                           'created_at', p.created_at, 'updated_at', p.updated_at,
+                           'category_ids', (SELECT json_group_array(pc.category_id)
+                                            FROM part_categories pc WHERE pc.part_id = p.id)),
+               CURRENT_TIMESTAMP
+        FROM parts p WHERE p.name LIKE '% (duplicate ' || p.id || ')' ORDER BY p.id
+    """)
+    op.create_index('ix_parts_dedup_key', 'parts', [sa.text(expression) for expression in DEDUP_KEY], unique=True)
+
+    op.create_table('import_runs',
+    sa.Column('digest', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('change_id', sa.Integer(), nullable=False),
+    sa.Column('rows', sa.Integer(), nullable=False),
+    sa.Column('errors', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('digest')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('import_runs')
+    op.drop_index('ix_parts_dedup_key', table_name='parts')
@@ -0,0 +1,29 @@
+# A basic script template used by Alembic when autogenerating
+# migration files. Kept minimal to support simple revisions.
+"""index part model
+
+Revision ID: 9a538f45b166
+Revises: ecd0b7ba4eb9
+Create Date: 2026-10-19 08:56:11.856762
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a538f45b166'
+down_revision: Union[str, None] = 'ecd0b7ba4eb9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_parts_model'), 'parts', ['model'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_parts_model'), table_name='parts')
@@ -0,0 +1,56 @@
+# A basic script template used by Alembic when autogenerating
+# migration files. Kept minimal to support simple revisions.
+"""add stock ledger
+
+Revision ID: ecd0b7ba4eb9
+Revises: 45cff88eb255
+Create Date: 2026-10-19 08:55:16.217176
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ecd0b7ba4eb9'
+down_revision: Union[str, None] = '45cff88eb255'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('stock_movements',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('part_id', sa.Integer(), nullable=False),
+    sa.Column('delta', sa.Integer(), nullable=False),
+    sa.Column('reason', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_stock_movements_part_id_created_at', 'stock_movements', ['part_id', 'created_at'], unique=False)
+    op.create_index('ix_stock_movements_created_at', 'stock_movements', ['created_at', 'part_id', 'delta'], unique=False)
+    op.create_table('stock_snapshots',
+    sa.Column('part_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('movement_count', sa.Integer(), nullable=False),
+    sa.Column('as_of', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('part_id')
+    )
+
+    # Open the ledger with each part's current quantity so the ledger always
+    # sums to parts.quantity
+    op.execute("""
+        INSERT INTO stock_movements (part_id, delta, reason, created_at)
+        SELECT id, quantity, 'opening balance', CURRENT_TIMESTAMP
+        FROM parts WHERE quantity != 0 ORDER BY id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('stock_snapshots')
+    op.drop_index('ix_stock_movements_created_at', table_name='stock_movements')
+    op.drop_index('ix_stock_movements_part_id_created_at', table_name='stock_movements')
+    op.drop_table('stock_movements')
@@ -0,0 +1,162 @@
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from urllib.parse import parse_qs
+import asyncio
+import json
+import os
+import time
+
+# Admission control. Every API request is classified as a cheap read, an
+# expensive scan or a write and must take a slot in that class's pool before it
+# runs. A full pool queues the request; a full queue or a queue wait longer than
+# the pool's timeout sheds it with 503 + Retry-After. Keeping the pools' total
+# below the threadpool size (40 by default) means a burst of imports and exports
+# can never take the threads that part lookups need.
+
+class AdmissionPool:
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float, retry_after: int):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.queued = 0  # requests that had to wait for a slot
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.wait_seconds = 0.0
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting in the queue if needed; False means the request should be shed"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.shed_queue_full += 1
+            return False
+
+        self.queued += 1
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot straight to the first waiter
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.shed_timeout += 1
+            return False
+        except asyncio.CancelledError:
+            self._discard(waiter)
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            self.wait_seconds += time.perf_counter() - started
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "wait_seconds_total": round(self.wait_seconds, 3),
+        }
+
+def _pool_from_env(name: str, limit: int, max_queue: int, timeout: float, retry_after: int) -> AdmissionPool:
+    prefix = f"ADMISSION_{name.upper()}_"
+    return AdmissionPool(
+        name,
+        limit=int(os.environ.get(prefix + "LIMIT", limit)),
+        max_queue=int(os.environ.get(prefix + "QUEUE", max_queue)),
+        timeout=float(os.environ.get(prefix + "TIMEOUT", timeout)),
+        retry_after=int(os.environ.get(prefix + "RETRY_AFTER", retry_after)),
+    )
+
+def pools_from_env() -> Dict[str, AdmissionPool]:
+    return {
+        "read": _pool_from_env("read", limit=24, max_queue=200, timeout=2.0, retry_after=1),
+        "scan": _pool_from_env("scan", limit=2, max_queue=8, timeout=30.0, retry_after=10),
+        "write": _pool_from_env("write", limit=4, max_queue=64, timeout=10.0, retry_after=2),
+    }
+
+# Long-lived or operational endpoints that must never queue
+EXEMPT_PATHS = {"/healthz", "/readyz", "/api/metrics", "/api/changes/stream"}
+# Cross-warehouse queries fan out to one thread per warehouse under a single slot
+SCAN_PREFIXES = ("/api/import/", "/api/export/", "/api/movements/", "/api/admin/", "/api/warehouses/")
+# POSTs that only read
+READ_POSTS = {"/api/parts/lookup", "/api/picklist"}
+
+def classify_request(method: str, path: str, query_string: bytes) -> Optional[str]:
+    """The pool a request runs in, or None if it bypasses admission control"""
+    if path in EXEMPT_PATHS or not path.startswith("/api/"):
+        return None
+    if path.startswith(SCAN_PREFIXES):
+        return "scan"
+    if method == "GET":
+        if path == "/api/parts" and parse_qs(query_string.decode("latin-1")).get("search"):
+            return "scan"
+        return "read"
+    if path in READ_POSTS:
+        return "read"
+    return "write"
+
+class AdmissionMiddleware:
+    """ASGI middleware holding a pool slot for the whole request, streamed responses included"""
+
+    def __init__(self, app, pools: Dict[str, AdmissionPool]):
+        self.app = app
+        self.pools = pools
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        kind = classify_request(scope["method"], scope["path"], scope.get("query_string", b""))
+        pool = self.pools.get(kind)
+        if pool is None:
+            return await self.app(scope, receive, send)
+
+        if not await pool.acquire():
+            await self._shed(pool, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            pool.release()
+
+    @staticmethod
+    async def _shed(pool: AdmissionPool, send) -> None:
+        body = json.dumps({"detail": f"Server busy ({pool.name} requests), retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(pool.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,283 @@
+"""
+Online backups of the SQLite database.
+
+Snapshots are taken with the SQLite online backup API a few pages at a time,
+pausing between steps so the copy doesn't starve requests of disk bandwidth.
+The app runs the database in WAL mode, so the backup reads one consistent
+snapshot while writers keep committing. The copy is integrity-checked,
+gzip-compressed and stored next to a sha256 checksum file (`sha256sum -c`
+compatible).
+
+    python -m backend.backup create
+    python -m backend.backup list
+    python -m backend.backup restore parts_inventory-20261019T101500123456Z.db.gz
+    python -m backend.backup --warehouse north create
+
+Each warehouse database is backed up on its own; snapshots of the default
+warehouse go in BACKUP_DIR and those of the others in BACKUP_DIR/<warehouse>.
+"""
+from sqlalchemy.engine import make_url
+from threading import Lock
+from typing import List, Optional
+from datetime import datetime, timezone
+import argparse
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from . import database
+
+logger = logging.getLogger("uvicorn.error")
+
+BACKUP_DIR = os.environ.get("BACKUP_DIR", "data/backups")
+BACKUP_RETENTION = int(os.environ.get("BACKUP_RETENTION", "7"))  # snapshots kept, 0 keeps all
+BACKUP_PAGES_PER_STEP = int(os.environ.get("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP = float(os.environ.get("BACKUP_STEP_SLEEP", "0.005"))
+BACKUP_COMPRESS_LEVEL = int(os.environ.get("BACKUP_COMPRESS_LEVEL", "6"))
+# Outside WAL mode a write from another connection makes the next step start
+# over. After this many restarts the rest is copied in one step, holding
+# writers off until done.
+BACKUP_MAX_RESTARTS = int(os.environ.get("BACKUP_MAX_RESTARTS", "20"))
+
+BACKUP_PREFIX = "parts_inventory-"
+BACKUP_SUFFIX = ".db.gz"
+
+_lock = Lock()
+
+class BackupInProgress(RuntimeError):
+    pass
+
+class _TooManyRestarts(Exception):
+    pass
+
+def database_path(warehouse: Optional[str] = None) -> str:
+    return make_url(database.database_url(warehouse)).database
+
+def backup_dir(warehouse: Optional[str] = None) -> str:
+    warehouse = database.resolve_warehouse(warehouse)
+    if warehouse == database.DEFAULT_WAREHOUSE:
+        return BACKUP_DIR
+    return os.path.join(BACKUP_DIR, warehouse)
+
+def _checksum_path(path: str) -> str:
+    return path + ".sha256"
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _read_checksum(path: str) -> Optional[str]:
+    try:
+        with open(_checksum_path(path)) as f:
+            return f.read().split()[0]
+    except (OSError, IndexError):
+        return None
+
+def _backup_read(path: str, duration: Optional[float] = None) -> database.BackupRead:
+    stat = os.stat(path)
+    return database.BackupRead(
+        name=os.path.basename(path),
+        size_bytes=stat.st_size,
+        sha256=_read_checksum(path),
+        created_at=datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+        duration_seconds=round(duration, 3) if duration is not None else None,
+    )
+
+def _copy_database(source: str, target: str) -> int:
+    """Copy source into target with the online backup API, returning the number of restarts"""
+    restarts = 0
+    remaining_before = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, remaining_before
+        if remaining_before is not None and remaining > remaining_before:
+            restarts += 1
+            if restarts > BACKUP_MAX_RESTARTS:
+                raise _TooManyRestarts()
+        remaining_before = remaining
+
+    src = sqlite3.connect(source, isolation_level=None)
+    dst = sqlite3.connect(target)
+    try:
+        if src.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            # Keep one read transaction open across all steps: every step copies
+            # the same snapshot, so commits in between neither restart the
+            # backup nor wait for it
+            src.execute("BEGIN")
+            src.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        try:
+            src.backup(dst, pages=BACKUP_PAGES_PER_STEP, progress=progress, sleep=BACKUP_STEP_SLEEP)
+        except _TooManyRestarts:
+            logger.warning("Backup restarted %d times under write load, finishing in one step", restarts)
+            src.backup(dst, pages=-1)
+    finally:
+        dst.close()
+        src.close()
+    return restarts
+
+def _check_integrity(path: str) -> None:
+    connection = sqlite3.connect(path)
+    try:
+        result = connection.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        connection.close()
+    if result != "ok":
+        raise ValueError(f"Integrity check failed: {result}")
+
+def list_backups(warehouse: Optional[str] = None) -> List[database.BackupRead]:
+    """Snapshots of a warehouse, newest first"""
+    directory = backup_dir(warehouse)
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(
+        (name for name in os.listdir(directory) if name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX)),
+        reverse=True,
+    )
+    return [_backup_read(os.path.join(directory, name)) for name in names]
+
+def prune_backups(warehouse: Optional[str] = None, keep: int = BACKUP_RETENTION) -> List[str]:
+    """Delete all but the newest `keep` snapshots of a warehouse and return the deleted names"""
+    if keep <= 0:
+        return []
+    pruned = []
+    for backup in list_backups(warehouse)[keep:]:
+        path = os.path.join(backup_dir(warehouse), backup.name)
+        os.remove(path)
+        if os.path.exists(_checksum_path(path)):
+            os.remove(_checksum_path(path))
+        pruned.append(backup.name)
+    return pruned
+
+def create_backup(warehouse: Optional[str] = None) -> database.BackupRead:
+    """Take a compressed, checksummed snapshot of a warehouse's live database and apply retention"""
+    if not _lock.acquire(blocking=False):
+        raise BackupInProgress("A backup or restore is already running")
+    try:
+        return _create_backup(warehouse)
+    finally:
+        _lock.release()
+
+def _create_backup(warehouse: Optional[str] = None, prune: bool = True) -> database.BackupRead:
+    started = time.perf_counter()
+    directory = backup_dir(warehouse)
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    path = os.path.join(directory, f"{BACKUP_PREFIX}{stamp}{BACKUP_SUFFIX}")
+    copy_path = path + ".copy"
+    partial_path = path + ".partial"
+    try:
+        restarts = _copy_database(database_path(warehouse), copy_path)
+        copied = time.perf_counter()
+        _check_integrity(copy_path)
+        with open(copy_path, "rb") as src, gzip.open(partial_path, "wb", compresslevel=BACKUP_COMPRESS_LEVEL) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        with open(_checksum_path(path), "w") as f:
+            f.write(f"{_sha256(partial_path)}  {os.path.basename(path)}\n")
+        os.replace(partial_path, path)
+    finally:
+        for leftover in (copy_path, partial_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    duration = time.perf_counter() - started
+    logger.info(
+        "Backup %s written in %.2fs (copy %.2fs, %d restarts)",
+        os.path.basename(path), duration, copied - started, restarts,
+    )
+    if prune:
+        prune_backups(warehouse)
+    return _backup_read(path, duration)
+
+def _max_change_id(connection: sqlite3.Connection) -> int:
+    return connection.execute("SELECT coalesce(max(id), 0) FROM change_log").fetchone()[0]
+
+def restore_backup(name: str, warehouse: Optional[str] = None, safety_backup: bool = True) -> Optional[database.BackupRead]:
+    """
+    Verify a snapshot and copy it over the live database through the backup
+    API, so open connections see the restored data without a restart. Unless
+    disabled, the current database is backed up first (outside retention, so
+    the snapshot being restored is never pruned). Returns None if there is no
+    snapshot with that name.
+
+    The restored change log would reuse ids clients have already synced past,
+    so a `reset` change is appended above the highest id the live database
+    had handed out. Sync clients that see it start over from since=0.
+    """
+    if not _lock.acquire(blocking=False):
+        raise BackupInProgress("A backup or restore is already running")
+    try:
+        if name not in {backup.name for backup in list_backups(warehouse)}:
+            return None
+        path = os.path.join(backup_dir(warehouse), name)
+        checksum = _read_checksum(path)
+        if checksum is None or checksum != _sha256(path):
+            raise ValueError(f"Checksum mismatch for {name}")
+        restored = _backup_read(path)
+
+        started = time.perf_counter()
+        restore_path = path + ".restore"
+        try:
+            with gzip.open(path, "rb") as src, open(restore_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            _check_integrity(restore_path)
+            if safety_backup:
+                _create_backup(warehouse, prune=False)
+            # One step: readers never see a half-restored database
+            src = sqlite3.connect(restore_path)
+            dst = sqlite3.connect(database_path(warehouse))
+            try:
+                floor = _max_change_id(dst)
+                src.backup(dst, pages=-1)
+                with dst:
+                    dst.execute(
+                        "INSERT INTO change_log (id, entity, entity_id, op, changed_at) "
+                        "VALUES (?, 'database', 0, 'reset', ?)",
+                        (max(floor, _max_change_id(dst)) + 1,
+                         datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")),
+                    )
+            finally:
+                dst.close()
+                src.close()
+        finally:
+            if os.path.exists(restore_path):
+                os.remove(restore_path)
+
+        duration = time.perf_counter() - started
+        logger.info("Restored %s in %.2fs", name, duration)
+        return restored.model_copy(update={"duration_seconds": round(duration, 3)})
+    finally:
+        _lock.release()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.backup", description="Online database backups")
+    parser.add_argument("--warehouse", choices=database.WAREHOUSES, help="defaults to the first configured warehouse")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("create", help="take a snapshot now")
+    commands.add_parser("list", help="list snapshots, newest first")
+    restore = commands.add_parser("restore", help="restore a snapshot over the live database")
+    restore.add_argument("name")
+    restore.add_argument("--no-safety-backup", action="store_true",
+                         help="don't back up the current database before restoring")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "create":
+        backup = create_backup(args.warehouse)
+        print(f"{backup.name}  {backup.size_bytes} bytes  {backup.duration_seconds}s")
+    elif args.command == "list":
+        for backup in list_backups(args.warehouse):
+            print(f"{backup.name}  {backup.size_bytes} bytes  {backup.created_at.isoformat()}")
+    else:
+        backup = restore_backup(args.name, args.warehouse, safety_backup=not args.no_safety_backup)
+        if backup is None:
+            parser.exit(1, f"No backup named {args.name}\n")
+        print(f"Restored {backup.name} in {backup.duration_seconds}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,145 @@
 from sqlmodel import Session, select
-from sqlalchemy import func
-from typing import List, Optional
-from datetime import datetime
+from sqlalchemy.orm import selectinload
+from sqlalchemy import and_, bindparam, case, delete, func, insert, literal, or_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+from pydantic_core import to_jsonable_python
+import json
+import string
 from . import database
+from .search_cache import normalize_search, search_cache
+
+# Change log helpers
+def record_change(db: Session, entity: str, entity_id: int, op: str, data: Optional[Dict[str, Any]] = None) -> None:
+    """Append a change log entry; committed together with the caller's transaction"""
+    db.add(database.ChangeLog(
+        entity=entity,
+        entity_id=entity_id,
+        op=op,
+        data=json.dumps(data, default=str) if data is not None else None,
+    ))
+
+def _change_row(entity: str, entity_id: int, op: str, data: Optional[Dict[str, Any]],
+                changed_at: datetime) -> Dict[str, Any]:
+    """record_change() as a plain row, for bulk inserts"""
+    return {
+        "entity": entity,
+        "entity_id": entity_id,
+        "op": op,
+        "data": json.dumps(data, default=str) if data is not None else None,
+        "changed_at": changed_at,
+    }
+
+def _part_snapshot(db_part: database.Part) -> Dict[str, Any]:
+    data = db_part.model_dump(mode="json")
+    data["category_ids"] = sorted(category.id for category in db_part.categories)
+    return data
+
+def _record_link_changes(db: Session, part_id: int, old_ids: set, new_ids: set) -> None:
+    for category_id in sorted(new_ids - old_ids):
+        record_change(db, "part_category", part_id, "upsert", {"part_id": part_id, "category_id": category_id})
+    for category_id in sorted(old_ids - new_ids):
+        record_change(db, "part_category", part_id, "delete", {"part_id": part_id, "category_id": category_id})
+
+def record_movement(db: Session, part_id: int, delta: int, reason: str) -> None:
+    """Append a stock movement; committed together with the caller's transaction"""
+    if delta:
+        db.add(database.StockMovement(part_id=part_id, delta=delta, reason=reason))
+
+def evaluate_stock_alerts(db: Session, part_ids: List[int]) -> None:
+    """
+    Raise alerts for the given parts that are now at or below their reorder
+    point and clear those that recovered. Run after every write that changes
+    quantities or reorder points, so the alert list never needs recomputing.
+    """
+    part = database.Part.__table__
+    alerts = database.StockAlert.__table__
+    now = datetime.now(timezone.utc)
+    for start in range(0, len(part_ids), UPSERT_CHUNK_SIZE):
+        chunk = part_ids[start:start + UPSERT_CHUNK_SIZE]
+        low = and_(database.low_stock_condition(part), part.c.id.in_(chunk))
+        db.execute(sqlite_insert(alerts).from_select(
+            ["part_id", "raised_at"],
+            select(part.c.id, literal(now, type_=alerts.c.raised_at.type)).where(low),
+        ).on_conflict_do_nothing())
+        db.execute(delete(alerts).where(
+            alerts.c.part_id.in_(chunk), alerts.c.part_id.not_in(select(part.c.id).where(low))
+        ))
+
+def _part_snapshot_rows(db: Session, where, changed_at: datetime, **overrides) -> List[Dict[str, Any]]:
+    """Change log rows with upsert snapshots for the parts matching `where`, read without the ORM"""
+    part = database.Part.__table__
+    link = database.PartCategoryLink.__table__
+    categories = {}
+    statement = select(link.c.part_id, link.c.category_id).where(
+        link.c.part_id.in_(select(part.c.id).where(where))
+    )
+    for part_id, category_id in db.execute(statement):
+        categories.setdefault(part_id, []).append(category_id)
+    
+    stamp = to_jsonable_python(changed_at)
+    rows = []
+    for row in db.execute(select(part).where(where)):
+        snapshot = to_jsonable_python(dict(row._mapping))
+        snapshot.update(overrides, updated_at=stamp, category_ids=sorted(categories.get(row.id, [])))
+        rows.append(_change_row("part", row.id, "upsert", snapshot, changed_at))
+    return rows
+
+def _record_part_tombstones(db: Session, where, changed_at: datetime) -> None:
+    """Tombstones and closing stock movements for the parts matching `where`, written set-based"""
+    part = database.Part.__table__
+    change_log = database.ChangeLog.__table__
+    movements = database.StockMovement.__table__
+    db.execute(insert(change_log).from_select(
+        ["entity", "entity_id", "op", "changed_at"],
+        select(
+            literal("part"), part.c.id, literal("delete"),
+            literal(changed_at, type_=change_log.c.changed_at.type),
+        ).where(where),
+    ))
+    db.execute(insert(movements).from_select(
+        ["part_id", "delta", "reason", "created_at"],
+        select(
+            part.c.id, -part.c.quantity, literal("delete"),
+            literal(changed_at, type_=movements.c.created_at.type),
+        ).where(where, part.c.quantity != 0),
+    ))
+
+def _record_link_tombstones(db: Session, where, changed_at: datetime) -> None:
+    """part_category delete tombstones for the category links matching `where`, written set-based"""
+    link = database.PartCategoryLink.__table__
+    change_log = database.ChangeLog.__table__
+    db.execute(insert(change_log).from_select(
+        ["entity", "entity_id", "op", "data", "changed_at"],
+        select(
+            literal("part_category"), link.c.part_id, literal("delete"),
+            func.json_object("part_id", link.c.part_id, "category_id", link.c.category_id),
+            literal(changed_at, type_=change_log.c.changed_at.type),
+        ).where(where),
+    ))
+
+def get_changes(db: Session, since: int = 0, limit: int = 1000) -> List[database.ChangeRead]:
+    statement = (
+        select(database.ChangeLog)
+        .where(database.ChangeLog.id > since)
+        .order_by(database.ChangeLog.id)
+        .limit(limit)
+    )
+    return [
+        database.ChangeRead(
+            id=change.id,
+            entity=change.entity,
+            entity_id=change.entity_id,
+            op=change.op,
+            data=json.loads(change.data) if change.data else None,
+            changed_at=change.changed_at,
+        )
+        for change in db.exec(statement).all()
+    ]
+
+def get_latest_change_id(db: Session) -> int:
+    return db.exec(select(func.max(database.ChangeLog.id))).one() or 0
 
 # Helper function to get parts by category IDs
 def get_parts_by_categories(db: Session, category_ids: List[int], skip: int = 0, limit: int = 100) -> List[database.Part]:
@@ -45,6 +182,8 @@ def get_bins(db: Session, skip: int = 0, limit: int = 100) -> List[database.BinR
 def create_bin(db: Session, bin: database.BinCreate) -> database.Bin:
     db_bin = database.Bin.model_validate(bin)
     db.add(db_bin)
+    db.flush()
+    record_change(db, "bin", db_bin.id, "upsert", db_bin.model_dump(mode="json"))
     db.commit()
     db.refresh(db_bin)
     return db_bin
@@ -55,16 +194,59 @@ def update_bin(db: Session, bin_id: int, bin_update: database.BinUpdate) -> Opti
         update_data = bin_update.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_bin, key, value)
+        record_change(db, "bin", db_bin.id, "upsert", db_bin.model_dump(mode="json"))
         db.commit()
         db.refresh(db_bin)
     return db_bin
 
-def delete_bin(db: Session, bin_id: int) -> Optional[database.Bin]:
-    db_bin = get_bin(db, bin_id)
-    if db_bin:
-        db.delete(db_bin)
-        db.commit()
-    return db_bin
+def delete_bin(db: Session, bin_id: int, move_parts_to: Optional[int] = None) -> Optional[Dict[str, int]]:
+    """
+    Delete a bin with set-based statements in one transaction. Its parts are
+    moved to `move_parts_to` when given, otherwise deleted along with their
+    category links. Returns the affected row counts, or None if the bin is missing.
+    """
+    if get_bin(db, bin_id) is None:
+        return None
+    
+    part = database.Part.__table__
+    now = datetime.now(timezone.utc)
+    counts = {"parts_moved": 0, "parts_deleted": 0, "links_deleted": 0}
+    if move_parts_to is not None:
+        changes = _part_snapshot_rows(db, part.c.bin_id == bin_id, now, bin_id=move_parts_to)
+        counts["parts_moved"] = db.execute(
+            update(part).where(part.c.bin_id == bin_id).values(bin_id=move_parts_to, updated_at=now)
+        ).rowcount
+        if changes:
+            db.execute(insert(database.ChangeLog.__table__), changes)
+    else:
+        in_bin = select(part.c.id).where(part.c.bin_id == bin_id)
+        _record_link_tombstones(db, database.PartCategoryLink.part_id.in_(in_bin), now)
+        _record_part_tombstones(db, part.c.bin_id == bin_id, now)
+        db.execute(delete(database.StockAlert.__table__).where(database.StockAlert.part_id.in_(in_bin)))
+        counts["links_deleted"] = db.execute(
+            delete(database.PartCategoryLink.__table__).where(database.PartCategoryLink.part_id.in_(in_bin))
+        ).rowcount
+        counts["parts_deleted"] = db.execute(delete(part).where(part.c.bin_id == bin_id)).rowcount
+    
+    db.execute(delete(database.Bin.__table__).where(database.Bin.id == bin_id))
+    record_change(db, "bin", bin_id, "delete")
+    db.commit()
+    return counts
+
+def count_bin_move_conflicts(db: Session, bin_id: int, target_bin_id: int) -> int:
+    """Count parts in a bin that already exist (same dedup key) in the target bin"""
+    source = database.Part.__table__.alias("source")
+    target = database.Part.__table__.alias("target")
+    statement = (
+        select(func.count())
+        .select_from(source)
+        .join(target, and_(
+            *(t == s for t, s in zip(database.dedup_key_columns(target)[:3], database.dedup_key_columns(source)[:3])),
+            target.c.bin_id == target_bin_id,
+        ))
+        .where(source.c.bin_id == bin_id)
+    )
+    return db.exec(statement).one()
 
 # Category CRUD operations
 def get_category(db: Session, category_id: int) -> Optional[database.Category]:
@@ -78,39 +260,132 @@ def get_categories(db: Session, skip: int = 0, limit: int = 100) -> List[databas
     statement = select(database.Category).offset(skip).limit(limit).order_by(database.Category.name)
     return db.exec(statement).all()
 
+def is_category_in_subtree(db: Session, root_id: int, category_id: int) -> bool:
+    """Whether category_id is root_id itself or one of its descendants"""
+    closure = database.CategoryClosure.__table__
+    statement = select(closure.c.depth).where(
+        closure.c.ancestor_id == root_id, closure.c.descendant_id == category_id
+    )
+    return db.execute(statement).first() is not None
+
+def _attach_category_subtree(db: Session, category_id: int, parent_id: Optional[int]) -> None:
+    """Link every node of category_id's subtree to every ancestor of parent_id"""
+    if parent_id is None:
+        return
+    closure = database.CategoryClosure.__table__
+    above = closure.alias("above")
+    below = closure.alias("below")
+    db.execute(insert(closure).from_select(
+        ["ancestor_id", "descendant_id", "depth"],
+        select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1)
+        .select_from(above.join(below, below.c.ancestor_id == category_id))
+        .where(above.c.descendant_id == parent_id),
+    ))
+
+def _detach_category_subtree(db: Session, category_id: int) -> None:
+    """Drop the closure rows linking category_id's subtree to the ancestors above it"""
+    closure = database.CategoryClosure.__table__
+    subtree = select(closure.c.descendant_id).where(closure.c.ancestor_id == category_id)
+    ancestors = select(closure.c.ancestor_id).where(
+        closure.c.descendant_id == category_id, closure.c.ancestor_id != category_id
+    )
+    db.execute(delete(closure).where(
+        closure.c.descendant_id.in_(subtree), closure.c.ancestor_id.in_(ancestors)
+    ))
+
 def create_category(db: Session, category: database.CategoryCreate) -> database.Category:
     db_category = database.Category.model_validate(category)
     db.add(db_category)
+    db.flush()
+    db.execute(insert(database.CategoryClosure.__table__).values(
+        ancestor_id=db_category.id, descendant_id=db_category.id, depth=0
+    ))
+    _attach_category_subtree(db, db_category.id, db_category.parent_id)
+    record_change(db, "category", db_category.id, "upsert", db_category.model_dump(mode="json"))
     db.commit()
     db.refresh(db_category)
     return db_category
 
 def update_category(db: Session, category_id: int, category_update: database.CategoryUpdate) -> Optional[database.Category]:
+    """
+    Update a category. Changing parent_id moves the whole subtree: its closure
+    rows are re-linked with two set-based statements, however deep it is.
+    The caller must ensure the new parent is not inside the moved subtree.
+    """
     db_category = get_category(db, category_id)
     if db_category:
         update_data = category_update.model_dump(exclude_unset=True)
+        if "parent_id" in update_data and update_data["parent_id"] != db_category.parent_id:
+            _detach_category_subtree(db, category_id)
+            _attach_category_subtree(db, category_id, update_data["parent_id"])
         for key, value in update_data.items():
             setattr(db_category, key, value)
+        record_change(db, "category", db_category.id, "upsert", db_category.model_dump(mode="json"))
         db.commit()
         db.refresh(db_category)
     return db_category
 
-def delete_category(db: Session, category_id: int) -> Optional[database.Category]:
+def delete_category(db: Session, category_id: int) -> Optional[Dict[str, int]]:
+    """
+    Delete a category and unlink it from its parts with set-based statements
+    in one transaction. Parts themselves are kept and child categories move up
+    to the deleted category's parent. Returns the affected row counts, or None
+    if the category is missing.
+    """
     db_category = get_category(db, category_id)
-    if db_category:
-        db.delete(db_category)
-        db.commit()
-    return db_category
+    if db_category is None:
+        return None
+    parent_id = db_category.parent_id
+    
+    link = database.PartCategoryLink.__table__
+    category = database.Category.__table__
+    closure = database.CategoryClosure.__table__
+    change_log = database.ChangeLog.__table__
+    now = datetime.now(timezone.utc)
+    
+    # Everything below the category gets one level closer to everything above it
+    descendants = select(closure.c.descendant_id).where(
+        closure.c.ancestor_id == category_id, closure.c.descendant_id != category_id
+    )
+    ancestors = select(closure.c.ancestor_id).where(
+        closure.c.descendant_id == category_id, closure.c.ancestor_id != category_id
+    )
+    db.execute(update(closure).where(
+        closure.c.descendant_id.in_(descendants), closure.c.ancestor_id.in_(ancestors)
+    ).values(depth=closure.c.depth - 1))
+    db.execute(delete(closure).where(
+        or_(closure.c.ancestor_id == category_id, closure.c.descendant_id == category_id)
+    ))
+    child_ids = db.execute(select(category.c.id).where(category.c.parent_id == category_id)).scalars().all()
+    if child_ids:
+        db.execute(update(category).where(category.c.id.in_(child_ids)).values(parent_id=parent_id))
+        db.execute(insert(change_log), [
+            _change_row("category", row.id, "upsert", to_jsonable_python(dict(row._mapping)), now)
+            for row in db.execute(select(category).where(category.c.id.in_(child_ids)))
+        ])
+    _record_link_tombstones(db, link.c.category_id == category_id, now)
+    links_deleted = db.execute(delete(link).where(link.c.category_id == category_id)).rowcount
+    db.execute(delete(database.Category.__table__).where(database.Category.id == category_id))
+    record_change(db, "category", category_id, "delete")
+    db.commit()
+    return {"links_deleted": links_deleted, "children_moved": len(child_ids)}
 
 # Part CRUD operations
 def get_part(db: Session, part_id: int) -> Optional[database.Part]:
     return db.get(database.Part, part_id)
 
-def get_parts(db: Session, skip: int = 0, limit: int = 100, bin_id: Optional[int] = None, category_ids: Optional[List[int]] = None) -> List[database.Part]:
+def get_parts(db: Session, skip: int = 0, limit: int = 100, bin_id: Optional[int] = None, category_ids: Optional[List[int]] = None,
+              include_descendants: bool = False) -> List[database.Part]:
     statement = select(database.Part)
     if bin_id:
         statement = statement.where(database.Part.bin_id == bin_id)
-    if category_ids:
+    if category_ids and include_descendants:
+        # Resolve each category's whole subtree through the closure table in the same query
+        statement = statement.join(database.PartCategoryLink).join(
+            database.CategoryClosure,
+            database.CategoryClosure.descendant_id == database.PartCategoryLink.category_id,
+        ).where(database.CategoryClosure.ancestor_id.in_(category_ids)).distinct()
+    elif category_ids:
         # Join with the junction table to filter by category IDs and ensure no duplicates
         statement = statement.join(database.PartCategoryLink).where(
             database.PartCategoryLink.category_id.in_(category_ids)
@@ -118,28 +393,118 @@ def get_parts(db: Session, skip: int = 0, limit: int = 100, bin_id: Optional[int
     statement = statement.offset(skip).limit(limit)
     return db.exec(statement).all()
 
-def search_parts(db: Session, search_term: str, skip: int = 0, limit: int = 100) -> List[database.Part]:
-    if not search_term.strip():
-        return []
+def get_part_by_barcode(db: Session, barcode: str) -> Optional[database.Part]:
+    key = database.normalize_identifier(barcode)
+    statement = select(database.Part).where(database.identifier_key(database.Part.barcode) == key)
+    return db.exec(statement).first()
+
+def find_duplicate_part(db: Session, name: str, manufacturer: Optional[str], model: Optional[str],
+                        bin_id: int) -> Optional[database.Part]:
+    """Find the part sharing this normalized name/manufacturer/model in the same bin"""
+    key = database.dedup_key(name, manufacturer, model, bin_id)
+    statement = select(database.Part).where(
+        and_(*(column == value for column, value in zip(database.dedup_key_columns(), key)))
+    )
+    return db.exec(statement).first()
+
+def lookup_parts(db: Session, codes: List[str]) -> database.PartLookupResult:
+    """Resolve scanned codes against normalized barcodes and models in one indexed query"""
+    # A code scanned twice is answered once
+    codes = list(dict.fromkeys(codes))
+    codes_by_key = {}
+    for code in codes:
+        key = database.normalize_identifier(code)
+        if key:
+            codes_by_key.setdefault(key, []).append(code)
     
-    # Split search term into individual words
-    search_words = [word.strip() for word in search_term.split() if word.strip()]
+    result = database.PartLookupResult()
+    if codes_by_key:
+        statement = (
+            select(database.Part)
+            .where(or_(
+                database.identifier_key(database.Part.barcode).in_(codes_by_key),
+                database.identifier_key(database.Part.model).in_(codes_by_key),
+            ))
+            .options(selectinload(database.Part.bin), selectinload(database.Part.categories))
+            .order_by(database.Part.id)
+        )
+        for db_part in db.exec(statement).all():
+            part_keys = {database.normalize_identifier(value) for value in (db_part.barcode, db_part.model) if value}
+            for key in part_keys & codes_by_key.keys():
+                for code in codes_by_key[key]:
+                    result.matches.setdefault(code, []).append(db_part)
     
-    statement = select(database.Part)
+    result.not_found = [code for code in codes if code not in result.matches]
+    return result
+
+def _search_condition(search_words) -> Any:
+    """Every word must appear in at least one of the part's text fields"""
+    return and_(*(
+        database.Part.name.ilike(f"%{word}%") |
+        database.Part.part_type.ilike(f"%{word}%") |
+        database.Part.specifications.ilike(f"%{word}%") |
+        database.Part.manufacturer.ilike(f"%{word}%") |
+        database.Part.model.ilike(f"%{word}%")
+        for word in search_words
+    ))
+
+# SQLite's NOCASE collation only folds ASCII letters
+_NOCASE = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def name_sort_key(name: str) -> str:
+    """Sort key matching search_parts(order_by_name=True), for merging pages from several warehouses"""
+    return name.translate(_NOCASE)
+
+def search_parts(db: Session, search_term: str, skip: int = 0, limit: int = 100,
+                 order_by_name: bool = False) -> List[database.Part]:
+    """
+    Parts matching every word of the search term in one of their text fields,
+    in id order or, with order_by_name, by case-insensitive name then id.
+    The matching ids of each page are cached until the next change is logged,
+    so repeated searches only fetch the page's parts by primary key.
+    """
+    search_words = normalize_search(search_term)
+    if not search_words:
+        return []
     
-    # For each word, ensure it appears in at least one field
-    for word in search_words:
-        word_pattern = f"%{word}%"
-        statement = statement.where(
-            database.Part.name.ilike(word_pattern) |
-            database.Part.part_type.ilike(word_pattern) |
-            database.Part.specifications.ilike(word_pattern) |
-            database.Part.manufacturer.ilike(word_pattern) |
-            database.Part.model.ilike(word_pattern)
+    # Sessions are bound to one warehouse database (see main.warehouse_session)
+    key = (db.info.get("warehouse"), search_words, skip, limit, order_by_name)
+    # Read before the search, so a write committing in between leaves the entry stale
+    version = get_latest_change_id(db)
+    part_ids = search_cache.get(key, version)
+    if part_ids is not None:
+        if not part_ids:
+            return []
+        statement = (
+            select(database.Part)
+            .where(database.Part.id.in_(part_ids))
+            .options(selectinload(database.Part.bin), selectinload(database.Part.categories))
         )
+        parts = {part.id: part for part in db.exec(statement).all()}
+        return [parts[part_id] for part_id in part_ids if part_id in parts]
     
-    statement = statement.offset(skip).limit(limit)
-    return db.exec(statement).all()
+    statement = (
+        select(database.Part)
+        .where(_search_condition(search_words))
+        .order_by(*((database.Part.name.collate("NOCASE"),) if order_by_name else ()), database.Part.id)
+        .offset(skip)
+        .limit(limit)
+        .options(selectinload(database.Part.bin), selectinload(database.Part.categories))
+    )
+    parts = db.exec(statement).all()
+    search_cache.put(key, [part.id for part in parts], version)
+    return parts
+
+def get_stock_totals(db: Session, search_term: str) -> Dict[str, int]:
+    """Number of parts matching the search and their total quantity"""
+    search_words = normalize_search(search_term)
+    if not search_words:
+        return {"part_count": 0, "quantity": 0}
+    statement = select(
+        func.count(database.Part.id), func.coalesce(func.sum(database.Part.quantity), 0)
+    ).where(_search_condition(search_words))
+    part_count, quantity = db.execute(statement).one()
+    return {"part_count": part_count, "quantity": quantity}
 
 def create_part(db: Session, part: database.PartCreate) -> database.Part:
     # Extract category_ids from the part data
@@ -148,18 +513,25 @@ def create_part(db: Session, part: database.PartCreate) -> database.Part:
     # Create part without category_ids (since it's not in the actual table)
     part_data = part.model_dump(exclude={'category_ids'})
     db_part = database.Part.model_validate(part_data)
+    if db_part.barcode is not None and not db_part.barcode.strip():
+        db_part.barcode = None
     db.add(db_part)
-    db.commit()
-    db.refresh(db_part)
     
     # Add category relationships
     if category_ids:
-        for category_id in category_ids:
-            category = get_category(db, category_id)
-            if category:
-                db_part.categories.append(category)
-        db.commit()
-        db.refresh(db_part)
+        with db.no_autoflush:
+            for category_id in category_ids:
+                category = get_category(db, category_id)
+                if category:
+                    db_part.categories.append(category)
+    
+    db.flush()
+    record_change(db, "part", db_part.id, "upsert", _part_snapshot(db_part))
+    _record_link_changes(db, db_part.id, set(), {category.id for category in db_part.categories})
+    record_movement(db, db_part.id, db_part.quantity, "create")
+    evaluate_stock_alerts(db, [db_part.id])
+    db.commit()
+    db.refresh(db_part)
     
     return db_part
 
@@ -169,12 +541,17 @@ def update_part(db: Session, part_id: int, part_update: database.PartUpdate) ->
         # Extract category_ids if present
         category_ids = getattr(part_update, 'category_ids', None)
         
+        old_quantity = db_part.quantity
+        
         # Update regular fields
         update_data = part_update.model_dump(exclude_unset=True, exclude={'category_ids'})
         for key, value in update_data.items():
             setattr(db_part, key, value)
+        if db_part.barcode is not None and not db_part.barcode.strip():
+            db_part.barcode = None
         
         # Update categories if provided
+        old_category_ids = {category.id for category in db_part.categories}
         if category_ids is not None:
             # Clear existing categories
             db_part.categories.clear()
@@ -185,7 +562,12 @@ def update_part(db: Session, part_id: int, part_update: database.PartUpdate) ->
                     db_part.categories.append(category)
         
         # Manually update the updated_at timestamp
-        db_part.updated_at = datetime.utcnow()
+        db_part.updated_at = datetime.now(timezone.utc)
+        record_change(db, "part", db_part.id, "upsert", _part_snapshot(db_part))
+        _record_link_changes(db, db_part.id, old_category_ids, {category.id for category in db_part.categories})
+        record_movement(db, db_part.id, db_part.quantity - old_quantity, "update")
+        db.flush()
+        evaluate_stock_alerts(db, [db_part.id])
         db.commit()
         db.refresh(db_part)
     return db_part
@@ -193,6 +575,378 @@ def update_part(db: Session, part_id: int, part_update: database.PartUpdate) ->
 def delete_part(db: Session, part_id: int) -> Optional[database.Part]:
     db_part = get_part(db, part_id)
     if db_part:
+        db.execute(delete(database.StockAlert.__table__).where(database.StockAlert.part_id == part_id))
+        _record_link_tombstones(db, database.PartCategoryLink.part_id == part_id, datetime.now(timezone.utc))
         db.delete(db_part)
+        record_change(db, "part", part_id, "delete")
+        record_movement(db, part_id, -db_part.quantity, "delete")
         db.commit()
-    return db_part
\ No newline at end of file
+    return db_part
+
+# Bulk import
+UPSERT_CHUNK_SIZE = 500
+UPSERT_FIELDS = ('name', 'quantity', 'part_type', 'specifications', 'manufacturer', 'model', 'barcode')
+
+def upsert_parts(db: Session, parts: List[database.PartCreate]) -> Dict[str, Any]:
+    """
+    Insert or update parts keyed on their dedup key (normalized name,
+    manufacturer and model within a bin) in one transaction. Rows identical
+    to what is stored, categories included, are skipped, so re-importing an
+    unchanged file performs only the lookup queries. Rows whose barcode
+    belongs to a different part are skipped and listed in `conflicts`.
+    """
+    part_table = database.Part.__table__
+    key_columns = database.dedup_key_columns()
+    
+    # Later rows win when a file repeats a part
+    incoming = {}
+    for part in parts:
+        incoming[database.dedup_key(part.name, part.manufacturer, part.model, part.bin_id)] = part
+    
+    # Fetch stored parts in chunks through the leading column of the dedup index
+    existing = {}
+    names = list({key[0] for key in incoming})
+    for start in range(0, len(names), UPSERT_CHUNK_SIZE):
+        # Row layout: dedup key (4), id, created_at, UPSERT_FIELDS, then the reorder settings
+        statement = select(
+            *key_columns, part_table.c.id, part_table.c.created_at,
+            *(part_table.c[field] for field in UPSERT_FIELDS),
+            part_table.c.reorder_point, part_table.c.reorder_quantity,
+        ).where(key_columns[0].in_(names[start:start + UPSERT_CHUNK_SIZE]))
+        for row in db.execute(statement):
+            key = tuple(row[:4])
+            if key in incoming:
+                existing[key] = row
+    
+    existing_categories = {row.id: set() for row in existing.values()}
+    part_ids = list(existing_categories)
+    for start in range(0, len(part_ids), UPSERT_CHUNK_SIZE):
+        statement = select(database.PartCategoryLink.part_id, database.PartCategoryLink.category_id).where(
+            database.PartCategoryLink.part_id.in_(part_ids[start:start + UPSERT_CHUNK_SIZE])
+        )
+        for part_id, category_id in db.execute(statement):
+            existing_categories[part_id].add(category_id)
+    
+    now = datetime.now(timezone.utc)
+    changed = []
+    counts: Dict[str, Any] = {"inserted": 0, "updated": 0, "unchanged": 0}
+    for key, part in incoming.items():
+        row = existing.get(key)
+        if row is None:
+            counts["inserted"] += 1
+        elif (tuple(row[6:6 + len(UPSERT_FIELDS)]) == tuple(getattr(part, field) for field in UPSERT_FIELDS)
+              and set(part.category_ids or []) == existing_categories[row.id]):
+            counts["unchanged"] += 1
+            continue
+        else:
+            counts["updated"] += 1
+        changed.append(key)
+    
+    # Barcodes are unique across parts; drop rows that would steal one
+    conflicts = []
+    barcode_owners = {}
+    for key in changed:
+        barcode = incoming[key].barcode
+        if barcode:
+            barcode_owners.setdefault(database.normalize_identifier(barcode), []).append(key)
+    barcode_keys = list(barcode_owners)
+    barcode_column = database.identifier_key(part_table.c.barcode)
+    for start in range(0, len(barcode_keys), UPSERT_CHUNK_SIZE):
+        statement = select(barcode_column, *key_columns).where(
+            barcode_column.in_(barcode_keys[start:start + UPSERT_CHUNK_SIZE])
+        )
+        for row in db.execute(statement):
+            barcode_owners[row[0]].append(tuple(row[1:]))
+    for owners in barcode_owners.values():
+        if len(set(owners)) > 1:
+            for key in set(owners) & set(incoming):
+                if key in changed:
+                    changed.remove(key)
+                    counts["updated" if key in existing else "inserted"] -= 1
+                    conflicts.append(incoming[key].barcode)
+    counts["conflicts"] = conflicts
+    
+    if not changed:
+        return counts
+    
+    statement = sqlite_insert(part_table)
+    statement = statement.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={field: statement.excluded[field] for field in UPSERT_FIELDS + ('updated_at',)},
+    )
+    for start in range(0, len(changed), UPSERT_CHUNK_SIZE):
+        db.execute(statement, [
+            {
+                **incoming[key].model_dump(include=set(UPSERT_FIELDS) | {'bin_id'}),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for key in changed[start:start + UPSERT_CHUNK_SIZE]
+        ])
+    
+    # Read back ids of inserted rows to link categories and record history
+    inserted_names = list({key[0] for key in changed if key not in existing})
+    ids = {key: row.id for key, row in existing.items()}
+    for start in range(0, len(inserted_names), UPSERT_CHUNK_SIZE):
+        statement = select(*key_columns, part_table.c.id).where(
+            key_columns[0].in_(inserted_names[start:start + UPSERT_CHUNK_SIZE])
+        )
+        for row in db.execute(statement):
+            ids.setdefault(tuple(row[:4]), row.id)
+    
+    # Links and history are written with one executemany per table rather
+    # than through the ORM, which dominates the cost of large imports
+    stamp = to_jsonable_python(now)
+    added_links, removed_links, changes, movements = [], [], [], []
+    for key in changed:
+        part = incoming[key]
+        part_id = ids[key]
+        row = existing.get(key)
+        old_categories = existing_categories.get(part_id, set())
+        new_categories = set(part.category_ids or [])
+        added_links.extend({"part_id": part_id, "category_id": c} for c in new_categories - old_categories)
+        removed_links.extend({"link_part_id": part_id, "link_category_id": c} for c in old_categories - new_categories)
+        
+        snapshot = {
+            "id": part_id,
+            **{field: getattr(part, field) for field in UPSERT_FIELDS},
+            "bin_id": part.bin_id,
+            "reorder_point": row.reorder_point if row is not None else None,
+            "reorder_quantity": row.reorder_quantity if row is not None else None,
+            "created_at": to_jsonable_python(row.created_at) if row is not None else stamp,
+            "updated_at": stamp,
+            "category_ids": sorted(new_categories),
+        }
+        changes.append(_change_row("part", part_id, "upsert", snapshot, now))
+        for category_id in sorted(new_categories - old_categories):
+            changes.append(_change_row("part_category", part_id, "upsert",
+                                       {"part_id": part_id, "category_id": category_id}, now))
+        for category_id in sorted(old_categories - new_categories):
+            changes.append(_change_row("part_category", part_id, "delete",
+                                       {"part_id": part_id, "category_id": category_id}, now))
+        delta = part.quantity - (row.quantity if row is not None else 0)
+        if delta:
+            movements.append({"part_id": part_id, "delta": delta, "reason": "import", "created_at": now})
+    
+    link_table = database.PartCategoryLink.__table__
+    if removed_links:
+        db.execute(delete(link_table).where(
+            link_table.c.part_id == bindparam("link_part_id"),
+            link_table.c.category_id == bindparam("link_category_id"),
+        ), removed_links)
+    if added_links:
+        db.execute(sqlite_insert(link_table).on_conflict_do_nothing(), added_links)
+    db.execute(insert(database.ChangeLog.__table__), changes)
+    if movements:
+        db.execute(insert(database.StockMovement.__table__), movements)
+    evaluate_stock_alerts(db, [ids[key] for key in changed if key in existing])
+    
+    db.commit()
+    return counts
+
+def get_unchanged_import(db: Session, digest: str) -> Optional[database.ImportRun]:
+    """Return the previous run of this file if nothing has changed since it finished"""
+    run = db.get(database.ImportRun, digest)
+    if run and run.change_id == get_latest_change_id(db):
+        return run
+    return None
+
+def record_import_run(db: Session, digest: str, rows: int, errors: List[str]) -> None:
+    statement = sqlite_insert(database.ImportRun.__table__).values(
+        digest=digest,
+        change_id=get_latest_change_id(db),
+        rows=rows,
+        errors=json.dumps(errors),
+        created_at=datetime.now(timezone.utc),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["digest"],
+        set_={field: statement.excluded[field] for field in ("change_id", "rows", "errors", "created_at")},
+    )
+    db.execute(statement)
+    db.commit()
+
+# Pick lists
+def resolve_pick_list(db: Session, items: List[database.PickListItem]) -> database.PickList:
+    """
+    Resolve requested items in one query and allocate stock in bin walk order
+    (bin location, then bin number). Items are matched by part_id, else
+    normalized model, else exact name; name/model matches can be picked from several bins.
+    """
+    part_ids = {item.part_id for item in items if item.part_id is not None}
+    models = {database.normalize_identifier(item.model) for item in items if item.part_id is None and item.model}
+    names = {item.name for item in items if item.part_id is None and not item.model and item.name}
+    
+    conditions = []
+    if part_ids:
+        conditions.append(database.Part.id.in_(part_ids))
+    if models:
+        conditions.append(database.identifier_key(database.Part.model).in_(models))
+    if names:
+        conditions.append(database.Part.name.in_(names))
+    
+    rows = []
+    if conditions:
+        statement = (
+            select(
+                database.Part.id, database.Part.name, database.Part.manufacturer, database.Part.model,
+                database.Part.quantity, database.Bin.id, database.Bin.number, database.Bin.location,
+            )
+            .join(database.Bin, database.Part.bin_id == database.Bin.id)
+            .where(or_(*conditions))
+            .order_by(database.Bin.location.is_(None), database.Bin.location, database.Bin.number, database.Part.id)
+        )
+        rows = db.exec(statement).all()
+    
+    # Candidate lists keep the walk order from the query
+    by_id, by_model, by_name = {}, {}, {}
+    for row in rows:
+        by_id[row[0]] = [row]
+        if row[3]:
+            by_model.setdefault(database.normalize_identifier(row[3]), []).append(row)
+        by_name.setdefault(row[1], []).append(row)
+    remaining = {row[0]: row[4] for row in rows}
+    
+    stops = {}
+    pick_list = database.PickList()
+    for index, item in enumerate(items):
+        if item.part_id is not None:
+            candidates = by_id.get(item.part_id, [])
+        elif item.model:
+            candidates = by_model.get(database.normalize_identifier(item.model), [])
+        else:
+            candidates = by_name.get(item.name, [])
+        if not candidates:
+            pick_list.unresolved.append(index)
+            continue
+        
+        available = sum(remaining[row[0]] for row in candidates)
+        needed = item.quantity
+        for part_id, name, manufacturer, model, _, bin_id, bin_number, location in candidates:
+            take = min(needed, remaining[part_id])
+            if take <= 0:
+                continue
+            remaining[part_id] -= take
+            needed -= take
+            if bin_id not in stops:
+                stops[bin_id] = database.PickStop(bin_id=bin_id, bin_number=bin_number, location=location)
+            stops[bin_id].lines.append(database.PickLine(
+                item=index, part_id=part_id, name=name, manufacturer=manufacturer, model=model, quantity=take,
+            ))
+            if needed == 0:
+                break
+        if needed:
+            pick_list.shortages.append(database.PickShortage(item=index, requested=item.quantity, available=available))
+    
+    pick_list.stops = sorted(
+        stops.values(), key=lambda stop: (stop.location is None, stop.location or "", stop.bin_number)
+    )
+    return pick_list
+
+# Stock ledger operations
+def adjust_part_quantity(db: Session, part_id: int, delta: int, reason: str) -> Optional[database.StockMovement]:
+    """Atomically apply a stock movement; returns None if the part is missing or would go negative"""
+    result = db.execute(
+        update(database.Part)
+        .where(database.Part.id == part_id, database.Part.quantity + delta >= 0)
+        .values(quantity=database.Part.quantity + delta, updated_at=datetime.now(timezone.utc))
+    )
+    if result.rowcount == 0:
+        db.rollback()
+        return None
+    
+    db_part = get_part(db, part_id)
+    db.refresh(db_part)
+    movement = database.StockMovement(part_id=part_id, delta=delta, reason=reason)
+    db.add(movement)
+    record_change(db, "part", part_id, "upsert", _part_snapshot(db_part))
+    evaluate_stock_alerts(db, [part_id])
+    db.commit()
+    db.refresh(movement)
+    return movement
+
+def get_stock_alerts(db: Session, skip: int = 0, limit: int = 100) -> List[database.StockAlertRead]:
+    """Parts at or below their reorder point, most recently raised first"""
+    part = database.Part.__table__
+    alerts = database.StockAlert.__table__
+    statement = (
+        select(
+            alerts.c.part_id, part.c.name, part.c.model, part.c.bin_id, part.c.quantity,
+            part.c.reorder_point, part.c.reorder_quantity, alerts.c.raised_at,
+        )
+        .join(part, part.c.id == alerts.c.part_id)
+        .order_by(alerts.c.raised_at.desc(), alerts.c.part_id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return [database.StockAlertRead(**row._mapping) for row in db.execute(statement)]
+
+def get_part_stock_history(db: Session, part_id: int, since: Optional[datetime] = None,
+                           until: Optional[datetime] = None, skip: int = 0, limit: int = 100) -> database.StockHistory:
+    """Movements for one part, newest first, with the compacted opening balance"""
+    statement = select(database.StockMovement).where(database.StockMovement.part_id == part_id)
+    if since:
+        statement = statement.where(database.StockMovement.created_at >= since)
+    if until:
+        statement = statement.where(database.StockMovement.created_at < until)
+    statement = statement.order_by(
+        database.StockMovement.created_at.desc(), database.StockMovement.id.desc()
+    ).offset(skip).limit(limit)
+    
+    snapshot = db.get(database.StockSnapshot, part_id)
+    return database.StockHistory(
+        part_id=part_id,
+        opening_quantity=snapshot.quantity if snapshot else 0,
+        opening_as_of=snapshot.as_of if snapshot else None,
+        movements=db.exec(statement).all(),
+    )
+
+def get_movement_summary(db: Session, since: datetime, until: datetime, skip: int = 0,
+                         limit: int = 100) -> List[database.StockMovementSummary]:
+    """Per-part movement totals within [since, until)"""
+    movement = database.StockMovement
+    statement = (
+        select(
+            movement.part_id,
+            func.sum(movement.delta),
+            func.sum(case((movement.delta > 0, movement.delta), else_=0)),
+            func.sum(case((movement.delta < 0, -movement.delta), else_=0)),
+            func.count(),
+        )
+        .where(movement.created_at >= since, movement.created_at < until)
+        .group_by(movement.part_id)
+        .order_by(movement.part_id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return [
+        database.StockMovementSummary(
+            part_id=part_id, net_delta=net, stock_in=stock_in, stock_out=stock_out, movement_count=count,
+        )
+        for part_id, net, stock_in, stock_out, count in db.exec(statement).all()
+    ]
+
+def compact_stock_movements(db: Session, before: datetime) -> Dict[str, int]:
+    """Fold movements older than `before` into the per-part snapshots and delete them"""
+    movement = database.StockMovement
+    snapshot = database.StockSnapshot
+    rolled_up = (
+        select(movement.part_id, func.sum(movement.delta), func.count(), func.max(movement.created_at))
+        .where(movement.created_at < before)
+        .group_by(movement.part_id)
+    )
+    statement = sqlite_insert(snapshot).from_select(
+        ["part_id", "quantity", "movement_count", "as_of"], rolled_up
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["part_id"],
+        set_={
+            "quantity": snapshot.quantity + statement.excluded.quantity,
+            "movement_count": snapshot.movement_count + statement.excluded.movement_count,
+            "as_of": statement.excluded.as_of,
+        },
+    )
+    parts = db.execute(statement).rowcount
+    movements = db.execute(delete(movement).where(movement.created_at < before)).rowcount
+    db.commit()
+    return {"parts": parts, "movements": movements}
\ No newline at end of file
@@ -0,0 +1,331 @@
+"""
+Chunked, resumable data migrations.
+
+Alembic runs each migration in one transaction, so a data migration that
+rewrites a large table holds the write lock for its whole run, shows no
+progress and starts over if it is interrupted. `copy_rows` instead copies
+rows with INSERT ... SELECT in bounded key ranges, committing every chunk
+together with a checkpoint row. An interrupted upgrade resumes after the last
+committed chunk, and progress (rows/sec and ETA) is logged as it goes.
+
+While a checkpoint exists the warehouse is read-only: MigrationGate refuses
+writes with 503 so no change lands in rows that were already copied, and
+reads keep being served. Any other time the schema is behind, every API
+request for the warehouse gets 503, so running the migrations next to the app
+(MIGRATE_IN_BACKGROUND=1 in the entrypoint) never lets requests hit a schema
+mid-change.
+
+Migration steps before a copy are committed when it starts, so they must be
+safe to run again (CREATE TABLE IF NOT EXISTS and the like). They must also
+leave the existing tables readable by the current models: copy into new
+tables and swap them in after the copy, rather than dropping or renaming
+columns first. /readyz only reports read_only while the models can read the
+schema, and 503 otherwise.
+
+The steps after the copies (dropping the old table, renaming the new one,
+recreating indexes) and finish_copies() run together inside
+final_transaction(). A migration must also resume from a swap that was
+committed but not stamped with its revision.
+"""
+from contextlib import contextmanager
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.exc import OperationalError
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qs
+from datetime import datetime, timezone
+import json
+import logging
+import os
+import time
+from . import database
+
+# Alembic's own logger, so progress shows up with its "Running upgrade" lines
+logger = logging.getLogger("alembic.runtime.migration")
+
+DATA_MIGRATION_CHUNK_SIZE = int(os.environ.get("DATA_MIGRATION_CHUNK_SIZE", "10000"))
+DATA_MIGRATION_PROGRESS_SECONDS = float(os.environ.get("DATA_MIGRATION_PROGRESS_SECONDS", "5"))
+# How long the app trusts its last look at the checkpoint table. A copy waits
+# this long after announcing itself so no write that missed it is still running.
+DATA_MIGRATION_CHECK_SECONDS = float(os.environ.get("DATA_MIGRATION_CHECK_SECONDS", "1"))
+DATA_MIGRATION_RETRY_AFTER = 30
+
+CHECKPOINT_TABLE = "data_migration_checkpoints"
+
+def _create_checkpoint_table(connection) -> None:
+    connection.exec_driver_sql(f"""
+        CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+            name VARCHAR(200) NOT NULL PRIMARY KEY,
+            last_key INTEGER,
+            rows_done INTEGER NOT NULL,
+            rows_total INTEGER NOT NULL,
+            rows_per_second FLOAT,
+            started_at DATETIME NOT NULL,
+            updated_at DATETIME NOT NULL
+        )
+    """)
+
+def _now() -> str:
+    # Stored as text in the format SQLAlchemy uses for DATETIME columns
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+def _format_progress(name: str, rows_done: int, rows_total: int, rate: float) -> str:
+    percent = 100.0 * rows_done / rows_total if rows_total else 100.0
+    eta = (rows_total - rows_done) / rate if rate > 0 else None
+    return "%s: %d/%d rows (%.1f%%), %.0f rows/s, ETA %s" % (
+        name, rows_done, rows_total, percent, rate, f"{eta:.0f}s" if eta is not None else "unknown",
+    )
+
+def copy_rows(name: str, source: str, target: str, columns: Sequence[str],
+              select_columns: Optional[Sequence[str]] = None, where: Optional[str] = None,
+              key: str = "id", chunk_size: int = DATA_MIGRATION_CHUNK_SIZE) -> int:
+    """
+    Copy rows of `source` into `target` from a migration script, in chunks of
+    `chunk_size` consecutive values of the integer `key` column. `columns` are
+    the target columns and `select_columns` the matching source expressions
+    (the same names by default); `where` filters source rows. `name` must be
+    unique per copy, since it identifies the checkpoint to resume from.
+    Returns the number of rows copied by this run.
+    """
+    from alembic import op
+
+    select_columns = select_columns or columns
+    condition = f" AND ({where})" if where else ""
+    insert = (
+        f"INSERT INTO {target} ({', '.join(columns)}) "
+        f"SELECT {', '.join(select_columns)} FROM {source} "
+        f"WHERE {source}.{key} > :after AND {source}.{key} <= :upto{condition}"
+    )
+    context = op.get_context()
+    if context.as_sql:
+        # Offline scripts can't checkpoint; emit the whole copy as one statement
+        op.execute(insert.replace(":after", "-9223372036854775808").replace(":upto", "9223372036854775807"))
+        return 0
+
+    with context.autocommit_block():
+        connection = op.get_bind()
+        _create_checkpoint_table(connection)
+        checkpoint = connection.execute(
+            text(f"SELECT last_key, rows_done, rows_total FROM {CHECKPOINT_TABLE} WHERE name = :name"),
+            {"name": name},
+        ).first()
+        if checkpoint is None:
+            last_key, rows_done = None, 0
+            rows_total = connection.execute(
+                text(f"SELECT count(*) FROM {source}" + (f" WHERE {where}" if where else ""))
+            ).scalar()
+            connection.execute(
+                text(f"INSERT INTO {CHECKPOINT_TABLE} (name, rows_done, rows_total, started_at, updated_at) "
+                     "VALUES (:name, 0, :rows_total, :now, :now)"),
+                {"name": name, "rows_total": rows_total, "now": _now()},
+            )
+            if rows_total:
+                time.sleep(DATA_MIGRATION_CHECK_SECONDS)
+        else:
+            last_key, rows_done, rows_total = checkpoint
+            logger.info("Resuming %s after %s with %d/%d rows copied", name, last_key, rows_done, rows_total)
+
+        started = time.perf_counter()
+        rows_before = rows_done
+        logged = started
+        while True:
+            after = last_key if last_key is not None else -9223372036854775808
+            # Upper key of the chunk; the remaining rows fit in one when there is none
+            upto = connection.execute(
+                text(f"SELECT {key} FROM {source} WHERE {key} > :after ORDER BY {key} LIMIT 1 OFFSET :offset"),
+                {"after": after, "offset": chunk_size - 1},
+            ).scalar()
+            if upto is None:
+                upto = connection.execute(text(f"SELECT max({key}) FROM {source}")).scalar()
+            if upto is None or upto <= after:
+                break
+
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                copied = connection.execute(text(insert), {"after": after, "upto": upto}).rowcount
+                rows_done += copied
+                elapsed = time.perf_counter() - started
+                rate = (rows_done - rows_before) / elapsed if elapsed > 0 else 0.0
+                connection.execute(
+                    text(f"UPDATE {CHECKPOINT_TABLE} SET last_key = :upto, rows_done = :rows_done, "
+                         "rows_per_second = :rate, updated_at = :now WHERE name = :name"),
+                    {"upto": upto, "rows_done": rows_done, "rate": rate,
+                     "now": _now(), "name": name},
+                )
+                connection.exec_driver_sql("COMMIT")
+            except BaseException:
+                connection.exec_driver_sql("ROLLBACK")
+                raise
+            last_key = upto
+
+            if time.perf_counter() - logged >= DATA_MIGRATION_PROGRESS_SECONDS:
+                logged = time.perf_counter()
+                logger.info(_format_progress(name, rows_done, max(rows_total, rows_done), rate))
+
+        elapsed = time.perf_counter() - started
+        rate = (rows_done - rows_before) / elapsed if elapsed > 0 else 0.0
+        logger.info("%s done in %.1fs", _format_progress(name, rows_done, max(rows_total, rows_done), rate), elapsed)
+    return rows_done - rows_before
+
+@contextmanager
+def final_transaction():
+    """
+    Run the steps after the copies in one explicit transaction. pysqlite sends
+    no BEGIN before DDL, so without it every DROP, RENAME and CREATE INDEX
+    would commit on its own and an interruption could leave the tables half
+    swapped.
+    """
+    from alembic import op
+
+    context = op.get_context()
+    if context.as_sql:
+        yield
+        return
+    with context.autocommit_block():
+        connection = op.get_bind()
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+        connection.exec_driver_sql("COMMIT")
+
+def finish_copies() -> None:
+    """
+    Drop the checkpoints at the end of a migration that used copy_rows. Call
+    it inside final_transaction(), so finished copies are skipped if the
+    migration is interrupted before the swap commits, and the warehouse stays
+    read-only until then.
+    """
+    from alembic import op
+    op.execute(f"DROP TABLE IF EXISTS {CHECKPOINT_TABLE}")
+
+def get_progress(warehouse: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Data migrations currently copying rows in a warehouse database, with their progress"""
+    with database.get_engine(warehouse).connect() as connection:
+        try:
+            rows = connection.execute(text(
+                f"SELECT name, rows_done, rows_total, rows_per_second, updated_at FROM {CHECKPOINT_TABLE} ORDER BY name"
+            )).mappings().all()
+        except OperationalError:
+            return []
+    progress = []
+    for row in rows:
+        rate = row["rows_per_second"] or 0.0
+        remaining = max(row["rows_total"] - row["rows_done"], 0)
+        progress.append({
+            "name": row["name"],
+            "rows_done": row["rows_done"],
+            "rows_total": row["rows_total"],
+            "rows_per_second": round(rate, 1),
+            "eta_seconds": round(remaining / rate, 1) if rate > 0 else None,
+            "updated_at": row["updated_at"],
+        })
+    return progress
+
+_script_directory = None
+_head_revision: Optional[str] = None
+_revisions: Optional[Set[str]] = None
+
+def _scripts():
+    global _script_directory
+    if _script_directory is None:
+        # Alembic is only needed here, so keep it off the import path
+        from alembic.config import Config
+        from alembic.script import ScriptDirectory
+        _script_directory = ScriptDirectory.from_config(Config("alembic.ini"))
+    return _script_directory
+
+def get_head_revision() -> str:
+    """Return the newest Alembic revision, reading the migration scripts only once"""
+    global _head_revision
+    if _head_revision is None:
+        _head_revision = _scripts().get_current_head()
+    return _head_revision
+
+def schema_behind(revision: Optional[str]) -> bool:
+    """
+    Whether a database stamped with `revision` still has migrations of this
+    app to run. A revision this app doesn't know is newer, e.g. stamped by a
+    newer release during a rolling deploy, and doesn't count.
+    """
+    global _revisions
+    if revision == get_head_revision():
+        return False
+    if _revisions is None:
+        _revisions = {script.revision for script in _scripts().walk_revisions()}
+    return revision is None or revision in _revisions
+
+def migration_state(warehouse: Optional[str] = None) -> str:
+    """
+    "ready", "read_only" while a data migration copies rows and the models can
+    read the schema meanwhile, or "migrating" while the schema is behind.
+    """
+    progress = get_progress(warehouse)
+    behind = schema_behind(database.get_schema_revision(warehouse))
+    if progress and (not behind or database.models_readable(warehouse)):
+        return "read_only"
+    return "migrating" if behind else "ready"
+
+class MigrationGate:
+    """
+    ASGI middleware holding API requests back while a warehouse is migrated.
+    Schema migrations run with the app answering 503 for that warehouse; a
+    chunked data migration the models can read through keeps serving reads and
+    refuses only writes.
+    """
+
+    def __init__(self, app, read_posts: Sequence[str] = ()):
+        self.app = app
+        self.read_posts = set(read_posts)
+        self._checked: Dict[str, Tuple[float, str]] = {}
+
+    def state(self, warehouse: str) -> str:
+        checked_at, state = self._checked.get(warehouse, (0.0, "ready"))
+        if time.monotonic() - checked_at >= DATA_MIGRATION_CHECK_SECONDS:
+            state = migration_state(warehouse)
+            self._checked[warehouse] = (time.monotonic(), state)
+        return state
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            return await self.app(scope, receive, send)
+        try:
+            warehouse = database.resolve_warehouse(_requested_warehouse(scope))
+        except ValueError:
+            # The route answers 404 for an unknown warehouse
+            return await self.app(scope, receive, send)
+        # state() may query SQLite, so keep it off the event loop
+        state = await run_in_threadpool(self.state, warehouse)
+        if state == "ready":
+            return await self.app(scope, receive, send)
+        if state == "read_only" and (scope["method"] in ("GET", "HEAD", "OPTIONS")
+                                     or scope["path"] in self.read_posts):
+            return await self.app(scope, receive, send)
+
+        if state == "read_only":
+            detail = "Read-only while a data migration runs, retry later"
+        else:
+            detail = "Unavailable while database migrations run, retry later"
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(DATA_MIGRATION_RETRY_AFTER).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+def _requested_warehouse(scope) -> Optional[str]:
+    """The warehouse named by the query string or X-Warehouse header, like main.get_warehouse"""
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if query.get("warehouse"):
+        return query["warehouse"][0]
+    for name, value in scope.get("headers", []):
+        if name == b"x-warehouse" and value:
+            return value.decode("latin-1")
+    return None
@@ -1,21 +1,79 @@
 from sqlmodel import SQLModel, Field, Relationship, create_engine, Session
-from typing import Optional, List
+from pydantic import field_validator
+from sqlalchemy import Index, and_, event, func, literal_column, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.engine import Engine, make_url
+from typing import Dict, Optional, List
 from datetime import datetime, timezone
 import os
-
-# Ensure data directory exists
-os.makedirs("data", exist_ok=True)
+import re
+import string
 
 DATABASE_URL = "sqlite:///./data/parts_inventory.db"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Each warehouse lives in its own SQLite database with its own engine and
+# connection pool. WAREHOUSES lists their keys; the first one serves requests
+# that don't name a warehouse. "default" is the original database file, so a
+# single-site install needs no configuration.
+DEFAULT_WAREHOUSE = "default"
+_WAREHOUSE_KEY = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+
+def _parse_warehouses(value: str) -> List[str]:
+    keys = [key.strip().lower() for key in value.split(",") if key.strip()]
+    for key in keys:
+        if not _WAREHOUSE_KEY.match(key):
+            raise ValueError(f"Invalid warehouse key {key!r}")
+    return list(dict.fromkeys(keys)) or [DEFAULT_WAREHOUSE]
+
+WAREHOUSES: List[str] = _parse_warehouses(os.environ.get("WAREHOUSES", DEFAULT_WAREHOUSE))
+
+def resolve_warehouse(warehouse: Optional[str] = None) -> str:
+    """The configured warehouse key for `warehouse`, or the first one when not given"""
+    if warehouse is None:
+        return WAREHOUSES[0]
+    if warehouse not in WAREHOUSES:
+        raise ValueError(f"Unknown warehouse {warehouse!r}")
+    return warehouse
+
+def database_url(warehouse: Optional[str] = None) -> str:
+    warehouse = resolve_warehouse(warehouse)
+    if warehouse == DEFAULT_WAREHOUSE:
+        return DATABASE_URL
+    return f"sqlite:///./data/warehouses/{warehouse}.db"
+
+# Engines are created on first use (normally from the app lifespan) rather
+# than at import time, so importing the models stays cheap for Alembic and
+# tooling and the data directory is only touched when we actually connect.
+engines: Dict[str, Engine] = {}
+
+def get_engine(warehouse: Optional[str] = None) -> Engine:
+    """Return the warehouse's shared engine, creating it (and its directory) on first use"""
+    warehouse = resolve_warehouse(warehouse)
+    if warehouse not in engines:
+        url = database_url(warehouse)
+        os.makedirs(os.path.dirname(make_url(url).database), exist_ok=True)
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        event.listen(engine, "connect", _use_wal)
+        engines[warehouse] = engine
+    return engines[warehouse]
+
+def dispose_engines() -> None:
+    """Close all pooled connections and forget every engine"""
+    for engine in engines.values():
+        engine.dispose()
+    engines.clear()
+
+def _use_wal(dbapi_connection, connection_record) -> None:
+    # WAL lets readers, including online backups, hold a snapshot without
+    # blocking writers. The mode is persistent, so this is a no-op after the first time.
+    dbapi_connection.execute("PRAGMA journal_mode=WAL")
 
 # Junction table for many-to-many relationship between Parts and Categories
 class PartCategoryLink(SQLModel, table=True):
     __tablename__ = "part_categories"
     
     part_id: int = Field(foreign_key="parts.id", primary_key=True)
-    category_id: int = Field(foreign_key="categories.id", primary_key=True)
+    category_id: int = Field(foreign_key="categories.id", primary_key=True, index=True)
 
 # SQLModel models that work both as database models and API schemas
 class BinBase(SQLModel):
@@ -49,6 +107,7 @@ class BinReadWithCount(BinRead):
 class CategoryBase(SQLModel):
     name: str = Field(max_length=100, unique=True, index=True)
     description: Optional[str] = Field(default=None)
+    parent_id: Optional[int] = Field(default=None, foreign_key="categories.id", index=True)
 
 class Category(CategoryBase, table=True):
     __tablename__ = "categories"
@@ -59,12 +118,23 @@ class Category(CategoryBase, table=True):
     # Many-to-many relationship with parts
     parts: List["Part"] = Relationship(back_populates="categories", link_model=PartCategoryLink)
 
+# Closure table for the category tree: one row per (ancestor, descendant)
+# pair including each category's self-row at depth 0, so a whole subtree is a
+# single indexed lookup on ancestor_id. Maintained set-based by crud.
+class CategoryClosure(SQLModel, table=True):
+    __tablename__ = "category_closure"
+
+    ancestor_id: int = Field(foreign_key="categories.id", primary_key=True)
+    descendant_id: int = Field(foreign_key="categories.id", primary_key=True, index=True)
+    depth: int
+
 class CategoryCreate(CategoryBase):
     pass
 
 class CategoryUpdate(SQLModel):
     name: Optional[str] = None
     description: Optional[str] = None
+    parent_id: Optional[int] = None  # explicit null moves the category to the top level
 
 class CategoryRead(CategoryBase):
     id: int
@@ -77,7 +147,10 @@ class PartBase(SQLModel):
     specifications: Optional[str] = Field(default=None)
     manufacturer: Optional[str] = Field(default=None, max_length=100)
     model: Optional[str] = Field(default=None, max_length=100)
-    bin_id: int = Field(foreign_key="bins.id")
+    barcode: Optional[str] = Field(default=None, max_length=100)
+    bin_id: int = Field(foreign_key="bins.id", index=True)
+    reorder_point: Optional[int] = Field(default=None, ge=0)  # low stock once quantity <= this
+    reorder_quantity: Optional[int] = Field(default=None, ge=1)  # suggested quantity to order
 
 class Part(PartBase, table=True):
     __tablename__ = "parts"
@@ -90,6 +163,72 @@ class Part(PartBase, table=True):
     bin: Bin = Relationship(back_populates="parts")
     categories: List[Category] = Relationship(back_populates="parts", link_model=PartCategoryLink)
 
+def normalize_identifier(code: str) -> str:
+    """Normalize a scanned code the same way identifier_key() does in SQL"""
+    return code.replace(" ", "").replace("-", "").upper()
+
+def identifier_key(column):
+    """
+    SQL expression normalizing an identifier column (drop spaces and dashes,
+    uppercase). It must render exactly like the index expressions below, so
+    the literals are inlined rather than bound.
+    """
+    return func.upper(func.replace(
+        func.replace(column, literal_column("' '"), literal_column("''")),
+        literal_column("'-'"), literal_column("''"),
+    ))
+
+# Exact-match lookups by scanned code go through these expression indexes
+Part.__table__.append_constraint(
+    Index("ix_parts_barcode_key", identifier_key(Part.__table__.c.barcode), unique=True)
+)
+Part.__table__.append_constraint(
+    Index("ix_parts_model_key", identifier_key(Part.__table__.c.model))
+)
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def _normalize_dedup_value(value: Optional[str]) -> str:
+    # Mirrors SQLite's lower(trim(coalesce(x, ''))), which only trims spaces
+    # and only lowercases ASCII
+    return (value or "").strip(" ").translate(_ASCII_LOWER)
+
+def dedup_key(name: str, manufacturer: Optional[str], model: Optional[str], bin_id: int) -> tuple:
+    """Python equivalent of dedup_key_columns() for a single part"""
+    return (
+        _normalize_dedup_value(name),
+        _normalize_dedup_value(manufacturer),
+        _normalize_dedup_value(model),
+        bin_id,
+    )
+
+def dedup_key_columns(table=None) -> list:
+    """
+    Expressions identifying a part for deduplication: normalized name,
+    manufacturer and model within a bin. Backed by a unique expression index
+    and used as the ON CONFLICT target for upsert imports. Pass an alias of
+    the parts table to build them for a self-join.
+    """
+    table = table if table is not None else Part.__table__
+    return [
+        func.lower(func.trim(table.c.name)),
+        func.lower(func.trim(func.coalesce(table.c.manufacturer, literal_column("''")))),
+        func.lower(func.trim(func.coalesce(table.c.model, literal_column("''")))),
+        table.c.bin_id,
+    ]
+
+Part.__table__.append_constraint(Index("ix_parts_dedup_key", *dedup_key_columns(), unique=True))
+
+def low_stock_condition(table=None):
+    """Parts at or below their reorder point; matches the partial index below so queries can use it"""
+    table = table if table is not None else Part.__table__
+    return and_(table.c.reorder_point.isnot(None), table.c.quantity <= table.c.reorder_point)
+
+# Only the few low parts are in this index, so finding them never scans the table
+Part.__table__.append_constraint(
+    Index("ix_parts_low_stock", Part.__table__.c.id, sqlite_where=low_stock_condition())
+)
+
 class PartCreate(PartBase):
     category_ids: Optional[List[int]] = Field(default_factory=list)
 
@@ -100,7 +239,10 @@ class PartUpdate(SQLModel):
     specifications: Optional[str] = None
     manufacturer: Optional[str] = None
     model: Optional[str] = None
+    barcode: Optional[str] = None
     bin_id: Optional[int] = None
+    reorder_point: Optional[int] = Field(default=None, ge=0)
+    reorder_quantity: Optional[int] = Field(default=None, ge=1)
     category_ids: Optional[List[int]] = None
 
 class PartRead(PartBase):
@@ -110,6 +252,183 @@ class PartRead(PartBase):
     bin: BinRead
     categories: List[CategoryRead] = []
 
+# Append-only change log feeding incremental sync. Every create/update/delete
+# in crud writes a row in the same transaction; the row id is the sync token.
+class ChangeLog(SQLModel, table=True):
+    __tablename__ = "change_log"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    entity: str = Field(max_length=50)  # bin, category, part, part_category or database
+    entity_id: int
+    op: str = Field(max_length=10)  # upsert, delete (tombstone) or reset (database restored)
+    data: Optional[str] = Field(default=None)  # JSON snapshot for upserts
+    changed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class ChangeRead(SQLModel):
+    id: int
+    entity: str
+    entity_id: int
+    op: str
+    data: Optional[dict] = None
+    changed_at: datetime
+
+class ChangeFeed(SQLModel):
+    changes: List[ChangeRead] = []
+    next_token: int
+    has_more: bool = False
+
+# Upsert imports remember each file's digest together with the change log
+# position right after the import, so re-importing the same file while nothing
+# has changed since can be answered without reading any parts
+class ImportRun(SQLModel, table=True):
+    __tablename__ = "import_runs"
+
+    digest: str = Field(primary_key=True, max_length=64)
+    change_id: int
+    rows: int
+    errors: Optional[str] = Field(default=None)  # JSON list of row errors
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+# Append-only stock ledger. Quantity changes write a movement in the same
+# transaction; old movements are periodically compacted into one snapshot per
+# part so that snapshot.quantity + sum(movements) always equals the quantity.
+# part_id deliberately has no foreign key so history outlives deleted parts.
+class StockMovement(SQLModel, table=True):
+    __tablename__ = "stock_movements"
+    __table_args__ = (
+        Index("ix_stock_movements_part_id_created_at", "part_id", "created_at"),
+        # Covers time-window aggregates without touching the table
+        Index("ix_stock_movements_created_at", "created_at", "part_id", "delta"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    part_id: int
+    delta: int
+    reason: str = Field(max_length=100)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class StockSnapshot(SQLModel, table=True):
+    __tablename__ = "stock_snapshots"
+
+    part_id: int = Field(primary_key=True)
+    quantity: int = Field(default=0)
+    movement_count: int = Field(default=0)
+    as_of: datetime
+
+# Parts currently at or below their reorder point. Kept up to date by every
+# quantity-changing write in crud, so raised_at records when a part went low.
+class StockAlert(SQLModel, table=True):
+    __tablename__ = "stock_alerts"
+
+    part_id: int = Field(foreign_key="parts.id", primary_key=True)
+    raised_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class StockAlertRead(SQLModel):
+    part_id: int
+    name: str
+    model: Optional[str] = None
+    bin_id: int
+    quantity: int
+    reorder_point: int
+    reorder_quantity: Optional[int] = None
+    raised_at: datetime
+
+class StockMovementCreate(SQLModel):
+    delta: int
+    reason: str = Field(min_length=1, max_length=100)
+
+    @field_validator("delta")
+    @classmethod
+    def delta_not_zero(cls, delta: int) -> int:
+        # A zero movement changes nothing; keep it out of the ledger like record_movement() does
+        if delta == 0:
+            raise ValueError("delta must not be zero")
+        return delta
+
+class StockMovementRead(SQLModel):
+    id: int
+    part_id: int
+    delta: int
+    reason: str
+    created_at: datetime
+
+class StockHistory(SQLModel):
+    part_id: int
+    opening_quantity: int = 0
+    opening_as_of: Optional[datetime] = None
+    movements: List[StockMovementRead] = []
+
+class StockMovementSummary(SQLModel):
+    part_id: int
+    net_delta: int
+    stock_in: int
+    stock_out: int
+    movement_count: int
+
+# Batch lookup by scanned code (barcode or model)
+class PartLookupRequest(SQLModel):
+    codes: List[str] = Field(max_length=1000)
+
+class PartLookupResult(SQLModel):
+    matches: Dict[str, List[PartRead]] = {}
+    not_found: List[str] = []
+
+# Pick lists: resolve a batch of requested parts and order them for a bin walk
+class PickListItem(SQLModel):
+    part_id: Optional[int] = None
+    name: Optional[str] = None
+    model: Optional[str] = None
+    quantity: int = Field(default=1, ge=1)
+
+class PickListRequest(SQLModel):
+    items: List[PickListItem] = Field(max_length=1000)
+
+class PickLine(SQLModel):
+    item: int  # index of the requested item
+    part_id: int
+    name: str
+    manufacturer: Optional[str] = None
+    model: Optional[str] = None
+    quantity: int
+
+class PickStop(SQLModel):
+    bin_id: int
+    bin_number: int
+    location: Optional[str] = None
+    lines: List[PickLine] = []
+
+class PickShortage(SQLModel):
+    item: int
+    requested: int
+    available: int
+
+class PickList(SQLModel):
+    stops: List[PickStop] = []
+    shortages: List[PickShortage] = []
+    unresolved: List[int] = []  # indexes of items that matched no part
+
+# Database snapshots written by backend.backup
+class BackupRead(SQLModel):
+    name: str
+    size_bytes: int
+    sha256: Optional[str] = None
+    created_at: datetime
+    duration_seconds: Optional[float] = None  # set when the snapshot was just taken or restored
+
+# Cross-warehouse queries; part, bin and category ids are only unique within a warehouse
+class WarehousePartRead(PartRead):
+    warehouse: str
+
+class WarehouseStock(SQLModel):
+    warehouse: str
+    part_count: int
+    quantity: int
+
+class StockTotals(SQLModel):
+    warehouses: List[WarehouseStock] = []
+    part_count: int
+    quantity: int
+
 # Response schemas with relationships
 class BinWithParts(BinRead):
     parts: List[PartRead] = []
@@ -117,9 +436,27 @@ class BinWithParts(BinRead):
 class CategoryWithParts(CategoryRead):
     parts: List[PartRead] = []
 
-def create_db_and_tables():
+def create_db_and_tables(warehouse: Optional[str] = None):
     """Create database tables"""
-    SQLModel.metadata.create_all(engine)
+    SQLModel.metadata.create_all(get_engine(warehouse))
+
+def get_schema_revision(warehouse: Optional[str] = None) -> Optional[str]:
+    """Return the Alembic revision the warehouse database is stamped with, or None if unmigrated"""
+    with get_engine(warehouse).connect() as connection:
+        try:
+            return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        except OperationalError:
+            return None
+
+def models_readable(warehouse: Optional[str] = None) -> bool:
+    """Whether every table the models map exists with all of their columns in the warehouse database"""
+    with get_engine(warehouse).connect() as connection:
+        try:
+            for table in SQLModel.metadata.sorted_tables:
+                connection.execute(table.select().limit(1)).all()
+        except OperationalError:
+            return False
+    return True
 
 # Note: updated_at field needs to be handled in the CRUD operations
 # SQLModel doesn't have automatic onupdate like SQLAlchemy's Column
\ No newline at end of file
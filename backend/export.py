@@ -0,0 +1,167 @@
+"""
+Columnar exports of the parts table for analytics.
+
+Parts are read straight from a SQLite cursor in batches, turned into Arrow
+record batches column by column and written as an Arrow IPC stream or a
+Parquet file (one row group per batch), so memory stays flat however many
+parts there are. pyarrow is imported on first use to keep app startup fast.
+
+    python -m backend.export parts.parquet
+    python -m backend.export parts.arrow --batch-size 100000
+    python -m backend.export north.parquet --warehouse north
+"""
+from typing import Iterator, List, Optional
+import argparse
+import os
+import time
+from . import database
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "65536"))
+EXPORT_FORMATS = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Category names are joined with the ASCII unit separator and split back into
+# a list column by Arrow, which keeps per-row work out of Python
+EXPORT_QUERY = """
+SELECT p.id, p.name, p.quantity, p.part_type, p.specifications, p.manufacturer,
+       p.model, p.barcode, p.bin_id, b.number, p.reorder_point, p.reorder_quantity,
+       (SELECT group_concat(c.name, char(31))
+          FROM part_categories pc JOIN categories c ON c.id = pc.category_id
+         WHERE pc.part_id = p.id),
+       p.created_at, p.updated_at
+  FROM parts p JOIN bins b ON b.id = p.bin_id
+ ORDER BY p.id
+"""
+
+def export_schema():
+    import pyarrow as pa
+    timestamp = pa.timestamp("us", tz="UTC")
+    return pa.schema([
+        ("id", pa.int64()),
+        ("name", pa.string()),
+        ("quantity", pa.int64()),
+        ("part_type", pa.string()),
+        ("specifications", pa.string()),
+        ("manufacturer", pa.string()),
+        ("model", pa.string()),
+        ("barcode", pa.string()),
+        ("bin_id", pa.int64()),
+        ("bin_number", pa.int64()),
+        ("reorder_point", pa.int64()),
+        ("reorder_quantity", pa.int64()),
+        ("categories", pa.list_(pa.string())),
+        ("created_at", timestamp),
+        ("updated_at", timestamp),
+    ])
+
+def _record_batch(schema, rows: List[tuple]):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    columns = list(zip(*rows))
+    arrays = []
+    for index, field in enumerate(schema):
+        if field.name == "categories":
+            names = pc.split_pattern(pa.array(columns[index], pa.string()), "\x1f")
+            arrays.append(pc.fill_null(names, pa.scalar([], field.type)))
+        elif pa.types.is_timestamp(field.type):
+            # SQLite stores naive UTC text; Arrow parses it without a Python round trip
+            arrays.append(pa.array(columns[index], pa.string()).cast(pa.timestamp("us")).cast(field.type))
+        else:
+            arrays.append(pa.array(columns[index], field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def iter_part_batches(batch_size: int = EXPORT_BATCH_SIZE, warehouse: Optional[str] = None) -> Iterator:
+    """Arrow record batches of all parts of a warehouse in id order, read with a raw DBAPI cursor"""
+    schema = export_schema()
+    connection = database.get_engine(warehouse).raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(EXPORT_QUERY)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield _record_batch(schema, rows)
+        cursor.close()
+    finally:
+        connection.close()
+
+class _ChunkSink:
+    """Write-only file object that hands out what was written since the last take()"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _open_writer(format: str, sink, schema):
+    if format == "arrow":
+        import pyarrow as pa
+        return pa.ipc.new_stream(sink, schema)
+    import pyarrow.parquet as pq
+    return pq.ParquetWriter(sink, schema, compression="zstd")
+
+def stream_parts(format: str, batch_size: int = EXPORT_BATCH_SIZE, warehouse: Optional[str] = None) -> Iterator[bytes]:
+    """Encoded export of all parts, yielded one batch at a time for a streaming response"""
+    sink = _ChunkSink()
+    writer = _open_writer(format, sink, export_schema())
+    for batch in iter_part_batches(batch_size, warehouse):
+        writer.write_batch(batch)
+        chunk = sink.take()
+        if chunk:
+            yield chunk
+    writer.close()
+    yield sink.take()
+
+def write_parts(path: str, format: Optional[str] = None, batch_size: int = EXPORT_BATCH_SIZE,
+                warehouse: Optional[str] = None) -> int:
+    """Export all parts to a file, choosing the format from the extension unless given; returns the row count"""
+    format = format or ("parquet" if path.endswith(".parquet") else "arrow")
+    rows = 0
+    with open(path, "wb") as f:
+        writer = _open_writer(format, f, export_schema())
+        for batch in iter_part_batches(batch_size, warehouse):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+        writer.close()
+    return rows
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.export", description="Export parts as Arrow or Parquet")
+    parser.add_argument("path", help="output file; .parquet writes Parquet, anything else an Arrow IPC stream")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS))
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--warehouse", choices=database.WAREHOUSES, help="defaults to the first configured warehouse")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = write_parts(args.path, args.format, args.batch_size, args.warehouse)
+    print(f"Exported {rows} parts to {args.path} in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import asyncio
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+import uuid
+
+# On-demand request profiling. With PROFILING=1, a request sent with an
+# X-Profile header (matching PROFILING_TOKEN when one is set) runs its endpoint
+# under cProfile and records every SQL statement it executes with its
+# duration. The response carries X-Profile-Id and a Server-Timing summary; the
+# full report is kept in memory and served from /api/admin/profiles. Without
+# PROFILING=1 none of this is installed and the header is ignored.
+
+PROFILING_ENABLED = os.environ.get("PROFILING", "0") == "1"
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN")
+PROFILES_KEPT = int(os.environ.get("PROFILES_KEPT", "20"))
+PROFILE_TOP_FUNCTIONS = 30
+PROFILE_MAX_STATEMENTS = 500
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.created_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.status: Optional[int] = None
+        self.statements: List[Dict[str, Any]] = []
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self._stats: Optional[pstats.Stats] = None
+        self._lock = threading.Lock()
+
+    def add_statement(self, statement: str, seconds: float) -> None:
+        with self._lock:
+            self.sql_count += 1
+            self.sql_seconds += seconds
+            if len(self.statements) < PROFILE_MAX_STATEMENTS:
+                self.statements.append({"sql": statement, "ms": round(seconds * 1000, 3)})
+
+    def add_profile(self, profiler: cProfile.Profile) -> None:
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profiler)
+            else:
+                self._stats.add(profiler)
+
+    def elapsed(self) -> float:
+        return self.duration if self.duration is not None else time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        return (f'app;dur={self.elapsed() * 1000:.1f}, '
+                f'sql;dur={self.sql_seconds * 1000:.1f};desc="{self.sql_count} queries"')
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "created_at": self.created_at,
+            "duration_ms": round(self.elapsed() * 1000, 3),
+            "sql_count": self.sql_count,
+            "sql_ms": round(self.sql_seconds * 1000, 3),
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """Summary plus the SQL statements, the slowest grouped by text, and the top functions"""
+        grouped: Dict[str, Dict[str, Any]] = {}
+        for statement in self.statements:
+            entry = grouped.setdefault(statement["sql"], {"sql": statement["sql"], "count": 0, "ms": 0.0})
+            entry["count"] += 1
+            entry["ms"] = round(entry["ms"] + statement["ms"], 3)
+        functions = ""
+        if self._stats is not None:
+            out = io.StringIO()
+            self._stats.stream = out
+            self._stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            functions = out.getvalue()
+        return dict(
+            self.summary(),
+            statements=self.statements,
+            slowest_statements=sorted(grouped.values(), key=lambda entry: entry["ms"], reverse=True)[:10],
+            functions=functions,
+        )
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+recent_profiles: Deque[RequestProfile] = deque(maxlen=PROFILES_KEPT)
+
+def get_profile(profile_id: str) -> Optional[RequestProfile]:
+    for profile in recent_profiles:
+        if profile.id == profile_id:
+            return profile
+    return None
+
+# SQL timings. The listeners are attached to every engine but do nothing
+# unless the statement runs on behalf of a profiled request; the context
+# variable follows the request into threadpool workers.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is not None and conn.info.get("profile_started"):
+        profile.add_statement(statement, time.perf_counter() - conn.info["profile_started"].pop())
+
+def _profiled(endpoint):
+    """Run the endpoint under cProfile in whichever thread it executes in, when its request is profiled"""
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def profiled_async(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                profiler.disable()
+                profile.add_profile(profiler)
+        return profiled_async
+
+    @functools.wraps(endpoint)
+    def profiled(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profiler.disable()
+            profile.add_profile(profiler)
+    return profiled
+
+class ProfiledRoute(APIRoute):
+    """Route class wrapping every endpoint so profiled requests run under cProfile"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+class ProfilingMiddleware:
+    """ASGI middleware starting a profile for requests that ask for one"""
+
+    def __init__(self, app):
+        self.app = app
+        if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @staticmethod
+    def requested(scope) -> bool:
+        for name, value in scope.get("headers", []):
+            if name == b"x-profile":
+                value = value.decode("latin-1")
+                return value == PROFILING_TOKEN if PROFILING_TOKEN else value not in ("", "0")
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.requested(scope):
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = _current.set(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile.id.encode()),
+                    (b"server-timing", profile.server_timing().encode()),
+                ])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            profile.duration = time.perf_counter() - profile.started
+            recent_profiles.append(profile)
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import os
+
+# Bounded LRU cache of part search results. Only the matching part ids are
+# stored, so a hit costs a primary-key fetch of one page. Every entry is tagged
+# with the version of its warehouse database it was computed under: the latest
+# committed change_log id. Every part write appends to the change log, so the
+# version moves with writes from any process sharing the database (replicas,
+# CLI restores, background migrations), and stale entries are dropped on lookup.
+
+def normalize_search(search_term: str) -> Tuple[str, ...]:
+    """
+    The distinct words of a search term, in a canonical order. Every word must
+    match for a part to be found, so word order and repeats don't change the
+    result; ASCII case doesn't either because LIKE ignores it.
+    """
+    words = {word.lower() if word.isascii() else word for word in search_term.split()}
+    return tuple(sorted(words))
+
+class SearchCache:
+    def __init__(self, max_entries: int = 256, max_ids: int = 100_000):
+        self.max_entries = max_entries
+        self.max_ids = max_ids  # total part ids held across all entries
+        self._entries: "OrderedDict[Hashable, Tuple[int, List[int]]]" = OrderedDict()
+        self._cached_ids = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, version: int) -> Optional[List[int]]:
+        """Cached ids for key, or None if missing or computed under another version"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    self._remove(key)
+                    self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, ids: List[int], version: int) -> None:
+        """
+        Store ids computed under `version` (read before running the query), so
+        results racing with a write are tagged with the older version and
+        missed on the next lookup
+        """
+        with self._lock:
+            if len(ids) > self.max_ids or self.max_entries <= 0:
+                return
+            self._remove(key)
+            self._entries[key] = (version, ids)
+            self._cached_ids += len(ids)
+            while len(self._entries) > self.max_entries or self._cached_ids > self.max_ids:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._cached_ids = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "cached_ids": self._cached_ids,
+                "max_ids": self.max_ids,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._cached_ids -= len(entry[1])
+
+# SEARCH_CACHE_ENTRIES=0 disables caching
+search_cache = SearchCache(
+    max_entries=int(os.getenv("SEARCH_CACHE_ENTRIES", "256")),
+    max_ids=int(os.getenv("SEARCH_CACHE_MAX_IDS", "100000")),
+)
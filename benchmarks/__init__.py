@@ -0,0 +1 @@
+"""Micro-benchmarks of crud, search, import and export on a generated inventory (python -m benchmarks)."""
@@ -0,0 +1,80 @@
+"""
+Run the benchmarks against a freshly generated inventory.
+
+    python -m benchmarks                          # run everything, print a table
+    python -m benchmarks --filter search          # only benchmarks whose name contains "search"
+    python -m benchmarks --save                   # store the results as the new baseline
+    python -m benchmarks --compare                # fail (exit 1) on regressions against the baseline
+    python -m benchmarks --parts 1000000 --low-stock-fraction 0.0003 --filter low_stock
+
+The gate compares medians: a benchmark regresses when it is more than
+--threshold times slower than the baseline and at least --min-delta-ms slower.
+Baselines are machine specific; regenerate benchmarks/baseline.json on the
+machine that runs the gate.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from . import cases  # noqa: F401  (registers the benchmarks)
+from .generate import generate
+from .harness import BENCHMARKS, Context, compare, environment, run_benchmark, save, use_database
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Run the micro-benchmark suite")
+    parser.add_argument("--parts", type=int, default=20000)
+    parser.add_argument("--bins", type=int, default=200)
+    parser.add_argument("--categories", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--low-stock-fraction", type=float, help="share of parts at or below their reorder point")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, help="override every benchmark's repetition count")
+    parser.add_argument("--save", nargs="?", const=BASELINE, metavar="PATH", help="write the results as a baseline")
+    parser.add_argument("--compare", nargs="?", const=BASELINE, metavar="PATH", help="compare against a baseline")
+    parser.add_argument("--threshold", type=float, default=1.5)
+    parser.add_argument("--min-delta-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory(prefix="partsdb-bench-") as tmpdir:
+        path = os.path.join(tmpdir, "bench.db")
+        started = time.perf_counter()
+        counts = generate(path, args.parts, args.bins, args.categories, seed=args.seed,
+                          low_stock_fraction=args.low_stock_fraction)
+        print(f"Generated {counts} in {time.perf_counter() - started:.1f}s")
+        use_database(path)
+
+        ctx = Context(args.parts, args.bins, args.categories, args.seed, tmpdir, args.low_stock_fraction)
+        results = {}
+        print(f"{'benchmark':32} {'median ms':>10} {'p95 ms':>10} {'baseline':>10}")
+        for name, bench in BENCHMARKS.items():
+            if args.filter not in name:
+                continue
+            results[name] = run_benchmark(bench, ctx, args.repeat)
+            before = baseline["results"].get(name, {}).get("median_ms") if baseline else None
+            print(f"{name:32} {results[name]['median_ms']:>10.3f} {results[name]['p95_ms']:>10.3f} "
+                  f"{before if before is not None else '':>10}")
+
+    meta = environment(ctx)
+    if args.save:
+        save(args.save, meta, results)
+        print(f"Saved baseline to {args.save}")
+    if baseline is not None:
+        try:
+            regressions = compare(baseline, meta, results, args.threshold, args.min_delta_ms)
+        except ValueError as e:
+            sys.exit(str(e))
+        if regressions:
+            sys.exit(f"Regressions over {args.threshold}x baseline: {', '.join(regressions)}")
+        print("No regressions")
+
+if __name__ == "__main__":
+    main()
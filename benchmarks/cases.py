@@ -0,0 +1,267 @@
+from datetime import timedelta
+import csv
+import hashlib
+import io
+import os
+from sqlalchemy import select
+from backend import crud, database, export
+from backend.search_cache import search_cache
+from .generate import START
+from .harness import benchmark
+
+# Reads
+@benchmark()
+def get_bin(db, ctx):
+    crud.get_bin(db, ctx.bin_id())
+
+@benchmark()
+def get_bin_by_number(db, ctx):
+    crud.get_bin_by_number(db, ctx.bin_id())
+
+@benchmark()
+def get_bins(db, ctx):
+    crud.get_bins(db, limit=100)
+
+@benchmark()
+def get_category(db, ctx):
+    crud.get_category(db, ctx.category_id())
+
+@benchmark()
+def get_category_by_name(db, ctx):
+    crud.get_category_by_name(db, f"Category {ctx.category_id()}")
+
+@benchmark()
+def get_categories(db, ctx):
+    crud.get_categories(db, limit=100)
+
+@benchmark()
+def is_category_in_subtree(db, ctx):
+    crud.is_category_in_subtree(db, 1, ctx.category_id())
+
+@benchmark()
+def get_part(db, ctx):
+    crud.get_part(db, ctx.part_id())
+
+@benchmark()
+def get_parts(db, ctx):
+    crud.get_parts(db, skip=ctx.rng.randint(0, max(ctx.parts - 100, 0)), limit=100)
+
+@benchmark()
+def get_parts_in_bin(db, ctx):
+    crud.get_parts(db, bin_id=ctx.bin_id(), limit=100)
+
+@benchmark()
+def get_parts_in_category(db, ctx):
+    crud.get_parts(db, category_ids=[ctx.category_id()], limit=100)
+
+@benchmark()
+def get_parts_in_category_tree(db, ctx):
+    crud.get_parts(db, category_ids=[1], include_descendants=True, limit=100)
+
+@benchmark()
+def get_parts_by_categories(db, ctx):
+    crud.get_parts_by_categories(db, [ctx.category_id(), ctx.category_id()], limit=100)
+
+@benchmark()
+def get_part_by_barcode(db, ctx):
+    crud.get_part_by_barcode(db, f"BC{ctx.part_id() | 1:09d}")
+
+def _existing_part(ctx):
+    with ctx.session() as db:
+        return crud.get_part(db, ctx.part_id())
+
+@benchmark(setup=_existing_part)
+def find_duplicate_part(db, part):
+    crud.find_duplicate_part(db, part.name, part.manufacturer, part.model, part.bin_id)
+
+@benchmark()
+def lookup_parts(db, ctx):
+    codes = [f"BC{ctx.part_id() | 1:09d}" for _ in range(50)]
+    codes += [f"mdl-{ctx.rng.randint(1, max(ctx.parts // 4, 1)):06d}" for _ in range(50)]
+    crud.lookup_parts(db, codes)
+
+def _uncached(ctx):
+    search_cache.clear()
+    return ctx
+
+@benchmark(setup=_uncached)
+def search_parts(db, ctx):
+    crud.search_parts(db, "resistor 10k", limit=100)
+
+@benchmark()
+def search_parts_cached(db, ctx):
+    crud.search_parts(db, "resistor 10k", limit=100)
+
+@benchmark(setup=_uncached)
+def get_stock_totals(db, ctx):
+    crud.get_stock_totals(db, "cable")
+
+@benchmark()
+def resolve_pick_list(db, ctx):
+    items = [database.PickListItem(part_id=ctx.part_id(), quantity=2) for _ in range(50)]
+    crud.resolve_pick_list(db, items)
+
+@benchmark()
+def get_stock_alerts(db, ctx):
+    crud.get_stock_alerts(db, limit=100)
+
+@benchmark()
+def low_stock(db, ctx):
+    # The partial index holds only the low parts, so this never scans the table
+    part = database.Part.__table__
+    db.execute(select(part.c.id).where(database.low_stock_condition(part))).all()
+
+@benchmark()
+def get_part_stock_history(db, ctx):
+    crud.get_part_stock_history(db, ctx.part_id())
+
+@benchmark(repeat=10)
+def get_movement_summary(db, ctx):
+    crud.get_movement_summary(db, since=START, until=START + timedelta(days=30), limit=100)
+
+@benchmark()
+def get_changes(db, ctx):
+    crud.get_changes(db, since=ctx.rng.randint(0, ctx.parts), limit=1000)
+
+@benchmark()
+def get_latest_change_id(db, ctx):
+    crud.get_latest_change_id(db)
+
+@benchmark()
+def get_unchanged_import(db, ctx):
+    crud.get_unchanged_import(db, hashlib.sha256(str(ctx.next_id()).encode()).hexdigest())
+
+@benchmark()
+def count_bin_move_conflicts(db, ctx):
+    crud.count_bin_move_conflicts(db, ctx.bin_id(), ctx.bin_id())
+
+# Writes
+@benchmark()
+def create_bin(db, ctx):
+    crud.create_bin(db, database.BinCreate(number=ctx.next_id(), location="Bench"))
+
+@benchmark()
+def update_bin(db, ctx):
+    crud.update_bin(db, ctx.bin_id(), database.BinUpdate(location=f"Aisle {ctx.next_id()}"))
+
+def _empty_bin(ctx):
+    with ctx.session() as db:
+        return crud.create_bin(db, database.BinCreate(number=ctx.next_id())).id
+
+@benchmark(setup=_empty_bin)
+def delete_bin(db, bin_id):
+    crud.delete_bin(db, bin_id)
+
+@benchmark()
+def create_category(db, ctx):
+    crud.create_category(db, database.CategoryCreate(name=f"Category {ctx.next_id()}", parent_id=ctx.category_id()))
+
+@benchmark()
+def update_category(db, ctx):
+    crud.update_category(db, ctx.category_id(), database.CategoryUpdate(description=f"Bench {ctx.next_id()}"))
+
+def _leaf_category(ctx):
+    with ctx.session() as db:
+        category = crud.create_category(db, database.CategoryCreate(name=f"Category {ctx.next_id()}",
+                                                                   parent_id=ctx.category_id()))
+        return category.id, ctx.rng.randint(1, max(ctx.categories // 10, 1))
+
+@benchmark(setup=_leaf_category)
+def move_category(db, prepared):
+    category_id, parent_id = prepared
+    crud.update_category(db, category_id, database.CategoryUpdate(parent_id=parent_id))
+
+@benchmark(setup=lambda ctx: _leaf_category(ctx)[0])
+def delete_category(db, category_id):
+    crud.delete_category(db, category_id)
+
+def _new_part(ctx) -> database.PartCreate:
+    return database.PartCreate(
+        name=f"Bench Part {ctx.next_id()}", quantity=10, part_type="Passive", manufacturer="Acme",
+        model=f"BENCH-{ctx.next_id()}", bin_id=ctx.bin_id(), category_ids=[ctx.category_id()],
+    )
+
+@benchmark()
+def create_part(db, ctx):
+    crud.create_part(db, _new_part(ctx))
+
+@benchmark()
+def update_part(db, ctx):
+    crud.update_part(db, ctx.part_id(), database.PartUpdate(quantity=ctx.rng.randint(0, 500),
+                                                           specifications=f"Rev {ctx.next_id()}"))
+
+def _created_part(ctx):
+    with ctx.session() as db:
+        return crud.create_part(db, _new_part(ctx)).id
+
+@benchmark(setup=_created_part)
+def delete_part(db, part_id):
+    crud.delete_part(db, part_id)
+
+@benchmark()
+def adjust_part_quantity(db, ctx):
+    crud.adjust_part_quantity(db, ctx.part_id(), ctx.rng.choice([-1, 1, 5]), "bench")
+
+def _upsert_batch(ctx):
+    # Half updates of generated parts, half new parts
+    with ctx.session() as db:
+        existing = [crud.get_part(db, ctx.part_id()) for _ in range(500)]
+        parts = [
+            database.PartCreate(name=part.name, quantity=part.quantity + 1, manufacturer=part.manufacturer,
+                                model=part.model, bin_id=part.bin_id)
+            for part in existing
+        ]
+    return parts + [_new_part(ctx) for _ in range(500)]
+
+@benchmark(repeat=5, setup=_upsert_batch)
+def upsert_parts_1000(db, parts):
+    crud.upsert_parts(db, parts)
+
+@benchmark()
+def record_import_run(db, ctx):
+    crud.record_import_run(db, hashlib.sha256(str(ctx.next_id()).encode()).hexdigest(), rows=1000, errors=[])
+
+def _old_movements(ctx):
+    with ctx.session() as db:
+        for _ in range(1000):
+            db.add(database.StockMovement(part_id=ctx.part_id(), delta=1, reason="bench",
+                                          created_at=START - timedelta(days=30)))
+        db.commit()
+    return ctx
+
+@benchmark(repeat=5, setup=_old_movements)
+def compact_stock_movements(db, ctx):
+    crud.compact_stock_movements(db, before=START - timedelta(days=1))
+
+# Import and export
+def _import_csv(ctx):
+    output = io.StringIO()
+    writer = csv.DictWriter(output, ["name", "quantity", "part_type", "manufacturer", "model", "bin_number", "category_name"])
+    writer.writeheader()
+    for _ in range(1000):
+        writer.writerow({"name": f"Imported Part {ctx.next_id()}", "quantity": 3, "part_type": "Cable",
+                         "manufacturer": "Globex", "model": f"IMP-{ctx.next_id()}",
+                         "bin_number": ctx.bin_id(), "category_name": f"Category {ctx.category_id()}"})
+    content = output.getvalue()
+    return content, hashlib.sha256(content.encode()).hexdigest()
+
+@benchmark(repeat=5, setup=_import_csv)
+def import_csv_1000(db, prepared):
+    # Imported here: main builds the whole app on import
+    import main
+    content, digest = prepared
+    main._import_rows(db, csv.DictReader(io.StringIO(content)), "upsert", digest)
+
+@benchmark(repeat=3)
+def export_csv(db, ctx):
+    import main
+    # The CSV is built before the response is returned
+    main.export_parts_csv(db)
+
+@benchmark(repeat=3)
+def export_arrow(db, ctx):
+    export.write_parts(os.path.join(ctx.tmpdir, "parts.arrow"), "arrow", warehouse=database.DEFAULT_WAREHOUSE)
+
+@benchmark(repeat=3)
+def export_parquet(db, ctx):
+    export.write_parts(os.path.join(ctx.tmpdir, "parts.parquet"), "parquet", warehouse=database.DEFAULT_WAREHOUSE)
@@ -0,0 +1,146 @@
+"""
+Deterministic synthetic inventory for benchmarks.
+
+The same seed and sizes always produce the same bins, category tree, parts,
+category links, reorder points, stock movements and change log, so benchmark
+runs on different commits measure the same data.
+
+    python -m benchmarks.generate data/bench.db --parts 100000 --bins 500 --categories 200
+    python -m benchmarks.generate data/bench.db --parts 1000000 --low-stock-fraction 0.0003
+
+A twentieth of the parts get a reorder point. By default their quantities are
+drawn independently of it, leaving roughly 0.3% of all parts low;
+--low-stock-fraction sets that share instead (at most 0.05).
+"""
+from sqlmodel import SQLModel
+from sqlalchemy import create_engine, event
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import argparse
+import os
+import random
+import time
+from backend import database
+
+ADJECTIVES = ["Red", "Blue", "Shielded", "Braided", "Compact", "Industrial", "Micro", "Dual", "Low Noise", "High Power"]
+NOUNS = ["Resistor", "Capacitor", "Cable", "Power Supply", "Adapter", "Connector", "Fuse", "Relay", "Switch", "Sensor"]
+PART_TYPES = ["Passive", "Cable", "Power", "Connector", "Electromechanical", "Sensor", "Semiconductor"]
+MANUFACTURERS = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Vandelay", "Stark", "Wayne", None]
+SPECIFICATIONS = ["10k 1% 0603", "100nF 50V X7R", "1.5m USB-C", "12V 2A", "M3 x 8mm", "250V 5A slow blow", "3.3V I2C"]
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+INSERT_BATCH = 10000
+REORDER_FRACTION = 0.05
+
+def _insert(connection, table, rows: List[Dict]) -> None:
+    for start in range(0, len(rows), INSERT_BATCH):
+        connection.execute(table.insert(), rows[start:start + INSERT_BATCH])
+
+def generate(path: str, parts: int = 20000, bins: int = 200, categories: int = 100,
+             movements_per_part: int = 2, seed: int = 42,
+             low_stock_fraction: Optional[float] = None) -> Dict[str, int]:
+    """Create a fresh database at `path` filled with synthetic inventory; returns the row counts"""
+    rng = random.Random(seed)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", database._use_wal)
+    SQLModel.metadata.create_all(engine)
+
+    bin_rows = [
+        {"id": number, "number": number, "size": rng.choice(["S", "M", "L", None]),
+         "location": f"Aisle {number % 20 + 1}, shelf {number % 7 + 1}", "created_at": START}
+        for number in range(1, bins + 1)
+    ]
+
+    # A tree roughly a tenth of whose categories are top level; every other
+    # category hangs under an earlier one
+    parents: Dict[int, int] = {}
+    category_rows = []
+    closure_rows = []
+    for category_id in range(1, categories + 1):
+        parent_id = None
+        if category_id > max(categories // 10, 1):
+            parent_id = rng.randint(1, category_id - 1)
+            parents[category_id] = parent_id
+        category_rows.append({"id": category_id, "name": f"Category {category_id}", "parent_id": parent_id,
+                              "description": None, "created_at": START})
+        ancestor, depth = category_id, 0
+        while ancestor is not None:
+            closure_rows.append({"ancestor_id": ancestor, "descendant_id": category_id, "depth": depth})
+            ancestor, depth = parents.get(ancestor), depth + 1
+
+    part_rows, link_rows, alert_rows, movement_rows, change_rows = [], [], [], [], []
+    for part_id in range(1, parts + 1):
+        quantity = rng.randint(0, 500)
+        reorder_point = rng.randint(5, 50) if rng.random() < REORDER_FRACTION else None
+        if low_stock_fraction is not None and reorder_point is not None:
+            if rng.random() < low_stock_fraction / REORDER_FRACTION:
+                quantity = rng.randint(0, reorder_point)
+            else:
+                quantity = rng.randint(reorder_point + 1, 500)
+        created_at = START + timedelta(minutes=part_id)
+        part_rows.append({
+            "id": part_id,
+            "name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {part_id}",
+            "quantity": quantity,
+            "part_type": rng.choice(PART_TYPES),
+            "specifications": rng.choice(SPECIFICATIONS),
+            "manufacturer": rng.choice(MANUFACTURERS),
+            "model": f"MDL-{rng.randint(1, max(parts // 4, 1)):06d}",
+            "barcode": f"BC{part_id:09d}" if part_id % 2 else None,
+            "bin_id": rng.randint(1, bins),
+            "reorder_point": reorder_point,
+            "reorder_quantity": reorder_point * 4 if reorder_point else None,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+        for category_id in rng.sample(range(1, categories + 1), k=min(rng.randint(0, 3), categories)):
+            link_rows.append({"part_id": part_id, "category_id": category_id})
+        if reorder_point is not None and quantity <= reorder_point:
+            alert_rows.append({"part_id": part_id, "raised_at": created_at})
+        for movement in range(movements_per_part):
+            movement_rows.append({"part_id": part_id, "delta": rng.choice([-5, -1, 1, 10]), "reason": "bench",
+                                  "created_at": created_at + timedelta(days=movement)})
+        change_rows.append({"entity": "part", "entity_id": part_id, "op": "upsert", "data": None,
+                            "changed_at": created_at})
+
+    with engine.begin() as connection:
+        _insert(connection, database.Bin.__table__, bin_rows)
+        _insert(connection, database.Category.__table__, category_rows)
+        _insert(connection, database.CategoryClosure.__table__, closure_rows)
+        _insert(connection, database.Part.__table__, part_rows)
+        _insert(connection, database.PartCategoryLink.__table__, link_rows)
+        _insert(connection, database.StockAlert.__table__, alert_rows)
+        _insert(connection, database.StockMovement.__table__, movement_rows)
+        _insert(connection, database.ChangeLog.__table__, change_rows)
+    engine.dispose()
+    return {
+        "bins": len(bin_rows),
+        "categories": len(category_rows),
+        "parts": len(part_rows),
+        "part_categories": len(link_rows),
+        "stock_alerts": len(alert_rows),
+        "stock_movements": len(movement_rows),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.generate", description="Generate a synthetic inventory")
+    parser.add_argument("path")
+    parser.add_argument("--parts", type=int, default=20000)
+    parser.add_argument("--bins", type=int, default=200)
+    parser.add_argument("--categories", type=int, default=100)
+    parser.add_argument("--movements-per-part", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--low-stock-fraction", type=float, help="share of all parts at or below their reorder point")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(args.path, args.parts, args.bins, args.categories, args.movements_per_part, args.seed,
+                      args.low_stock_fraction)
+    print(f"Generated {counts} in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    main()
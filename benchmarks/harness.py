@@ -0,0 +1,130 @@
+from dataclasses import dataclass, field
+from sqlmodel import Session
+from typing import Any, Callable, Dict, List, Optional
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import time
+from backend import database
+
+# Benchmarks are plain functions taking a fresh session and whatever their
+# setup returned (the Context when there is no setup). Setup runs before every
+# repetition and is not timed, so write benchmarks can create the rows they
+# update or delete.
+
+@dataclass
+class Benchmark:
+    name: str
+    func: Callable[[Session, Any], Any]
+    setup: Optional[Callable[["Context"], Any]] = None
+    repeat: int = 20
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+def benchmark(repeat: int = 20, setup: Optional[Callable[["Context"], Any]] = None, name: Optional[str] = None):
+    def register(func):
+        BENCHMARKS[name or func.__name__] = Benchmark(name or func.__name__, func, setup, repeat)
+        return func
+    return register
+
+@dataclass
+class Context:
+    """The generated inventory's sizes plus a seeded RNG, so every run makes the same picks"""
+    parts: int
+    bins: int
+    categories: int
+    seed: int
+    tmpdir: str
+    low_stock_fraction: Optional[float] = None
+    rng: random.Random = field(init=False)
+    _counter: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        self.rng = random.Random(self.seed)
+
+    def session(self) -> Session:
+        return Session(database.get_engine(database.DEFAULT_WAREHOUSE), info={"warehouse": database.DEFAULT_WAREHOUSE})
+
+    def next_id(self) -> int:
+        """A number no generated or previously created row uses"""
+        self._counter += 1
+        return 10_000_000 + self._counter
+
+    def part_id(self) -> int:
+        return self.rng.randint(1, self.parts)
+
+    def bin_id(self) -> int:
+        return self.rng.randint(1, self.bins)
+
+    def category_id(self) -> int:
+        return self.rng.randint(1, self.categories)
+
+def use_database(path: str) -> None:
+    """Point the default warehouse at the benchmark database"""
+    database.dispose_engines()
+    database.DATABASE_URL = f"sqlite:///{path}"
+    database.WAREHOUSES = [database.DEFAULT_WAREHOUSE]
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def run_benchmark(bench: Benchmark, ctx: Context, repeat: Optional[int] = None) -> Dict[str, float]:
+    samples = []
+    # Seeded per benchmark, so picks don't depend on which benchmarks ran before
+    ctx.rng = random.Random(f"{ctx.seed}:{bench.name}")
+    # One untimed warm-up run fills SQLite's page cache and SQLAlchemy's statement cache
+    for iteration in range((repeat or bench.repeat) + 1):
+        prepared = bench.setup(ctx) if bench.setup else ctx
+        with ctx.session() as db:
+            started = time.perf_counter()
+            bench.func(db, prepared)
+            elapsed = time.perf_counter() - started
+        if iteration:
+            samples.append(elapsed * 1000)
+    return {
+        "runs": len(samples),
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(_percentile(samples, 0.95), 4),
+        "min_ms": round(min(samples), 4),
+    }
+
+def environment(ctx: Context) -> Dict[str, Any]:
+    return {
+        "parts": ctx.parts,
+        "bins": ctx.bins,
+        "categories": ctx.categories,
+        "seed": ctx.seed,
+        "low_stock_fraction": ctx.low_stock_fraction,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.machine(),
+    }
+
+def save(path: str, meta: Dict[str, Any], results: Dict[str, Dict[str, float]]) -> None:
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def compare(baseline: Dict[str, Any], meta: Dict[str, Any], results: Dict[str, Dict[str, float]],
+            threshold: float, min_delta_ms: float) -> List[str]:
+    """
+    Names of benchmarks whose median is more than `threshold` times the
+    baseline's and slower by at least `min_delta_ms`, which keeps sub-
+    millisecond noise from failing the gate. Raises ValueError if the
+    baseline was taken on a differently sized inventory.
+    """
+    for key in ("parts", "bins", "categories", "seed", "low_stock_fraction"):
+        if baseline["meta"].get(key) != meta[key]:
+            raise ValueError(f"Baseline was generated with {key}={baseline['meta'].get(key)}, this run used {meta[key]}")
+    regressions = []
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        delta = result["median_ms"] - before["median_ms"]
+        if result["median_ms"] > before["median_ms"] * threshold and delta >= min_delta_ms:
+            regressions.append(name)
+    return regressions
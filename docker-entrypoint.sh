@@ -1,14 +1,29 @@
 #!/bin/bash
 set -e
 
+# Record when the container started so the app can report start-to-ready time
+export PARTSDB_STARTED_AT="${PARTSDB_STARTED_AT:-$(date +%s.%N)}"
+
 # Ensure data directory exists
 mkdir -p /app/data
 
-# Run database migrations
-echo "Running database migrations..."
-alembic upgrade head
-
-echo "Database setup complete."
+# Run database migrations. Extra replicas sharing a database can set
+# RUN_MIGRATIONS=0 to start immediately; /readyz reports 503 until the
+# schema reaches the latest revision. MIGRATE_IN_BACKGROUND=1 starts the app
+# while migrations run. API requests get 503 until the schema is migrated,
+# except during chunked data migrations that keep the tables readable by the
+# current models: those serve reads (/readyz reports "read_only" with their
+# progress). See ALEMBIC.md for which migrations allow that.
+if [ "${RUN_MIGRATIONS:-1}" != "0" ] && [ "${MIGRATE_IN_BACKGROUND:-0}" = "1" ]; then
+    echo "Running database migrations in the background..."
+    (alembic upgrade head && echo "Database setup complete." || echo "Database migrations failed.") &
+elif [ "${RUN_MIGRATIONS:-1}" != "0" ]; then
+    echo "Running database migrations..."
+    alembic upgrade head
+    echo "Database setup complete."
+else
+    echo "Skipping database migrations (RUN_MIGRATIONS=0)."
+fi
 
 # Start the application
-exec "$@"
\ No newline at end of file
+exec "$@"
@@ -1,14 +1,87 @@
-from fastapi import FastAPI, HTTPException, Depends, Request, UploadFile, File, Query
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, UploadFile, File, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from contextlib import asynccontextmanager
 from sqlmodel import Session
 from typing import List, Optional
+import asyncio
 import csv
+import hashlib
 import io
-from backend import database, crud
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from backend import admission, backup, data_migration, database, crud, export, profiling
+from backend.search_cache import search_cache
+
+# Log through uvicorn so startup timings show up alongside its own messages
+logger = logging.getLogger("uvicorn.error")
+
+# Start of the container/process, used to report start-to-ready time. The
+# entrypoint exports the moment the container started so migrations count too.
+STARTED_AT = float(os.environ.get("PARTSDB_STARTED_AT") or time.time())
+
+# Stock ledger compaction: movements older than the retention window are
+# folded into per-part snapshots on this interval (0 disables the job)
+LEDGER_RETENTION_DAYS = int(os.environ.get("LEDGER_RETENTION_DAYS", "365"))
+LEDGER_COMPACT_INTERVAL_HOURS = float(os.environ.get("LEDGER_COMPACT_INTERVAL_HOURS", "24"))
+
+def warehouse_session(warehouse: Optional[str] = None) -> Session:
+    """A session on one warehouse's database, tagged with its key for per-warehouse caching"""
+    warehouse = database.resolve_warehouse(warehouse)
+    return Session(database.get_engine(warehouse), info={"warehouse": warehouse})
+
+def compact_ledger(warehouse: Optional[str] = None, older_than_days: int = LEDGER_RETENTION_DAYS) -> dict:
+    before = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    with warehouse_session(warehouse) as db:
+        return crud.compact_stock_movements(db, before=before)
+
+async def compact_ledger_periodically():
+    while True:
+        await asyncio.sleep(LEDGER_COMPACT_INTERVAL_HOURS * 3600)
+        for warehouse in database.WAREHOUSES:
+            try:
+                result = await run_in_threadpool(compact_ledger, warehouse)
+                logger.info("Compacted %(movements)d stock movements across %(parts)d parts in %(warehouse)s",
+                            dict(result, warehouse=warehouse))
+            except Exception:
+                logger.exception("Stock ledger compaction failed in %s", warehouse)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    for warehouse in database.WAREHOUSES:
+        database.get_engine(warehouse)
+    compaction = None
+    if LEDGER_COMPACT_INTERVAL_HOURS > 0:
+        compaction = asyncio.create_task(compact_ledger_periodically())
+    logger.info("Application startup took %.2fs", time.time() - STARTED_AT)
+    yield
+    if compaction:
+        compaction.cancel()
+    database.dispose_engines()
 
 # Initialize FastAPI app
-app = FastAPI(title="Parts Inventory Management", version="1.0.0")
+app = FastAPI(title="Parts Inventory Management", version="1.0.0", lifespan=lifespan)
+
+# Admission control: separate concurrency budgets for reads, scans and writes
+# (ADMISSION_CONTROL=0 disables it)
+admission_pools = admission.pools_from_env()
+if os.environ.get("ADMISSION_CONTROL", "1") != "0":
+    app.add_middleware(admission.AdmissionMiddleware, pools=admission_pools)
+
+# API requests wait out schema migrations, and warehouses are read-only while
+# a chunked data migration copies their rows
+app.add_middleware(data_migration.MigrationGate, read_posts=admission.READ_POSTS)
+
+# Opt-in request profiling (PROFILING=1, then send an X-Profile header). The
+# route class must be set before the routes below are declared.
+if profiling.PROFILING_ENABLED:
+    app.router.route_class = profiling.ProfiledRoute
+    app.add_middleware(profiling.ProfilingMiddleware)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -18,11 +91,71 @@ templates = Jinja2Templates(directory="templates")
 
 # Note: Database tables are created by the entrypoint script
 
-# Dependency
-def get_db():
-    with Session(database.engine) as session:
+# Dependencies
+def get_warehouse(warehouse: Optional[str] = Query(None, description="Warehouse key; overrides the X-Warehouse header"),
+                  x_warehouse: Optional[str] = Header(None)) -> str:
+    """The warehouse a request is routed to; the first configured one when it names none"""
+    try:
+        return database.resolve_warehouse(warehouse or x_warehouse)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Unknown warehouse")
+
+def get_db(warehouse: str = Depends(get_warehouse)):
+    with warehouse_session(warehouse) as session:
         yield session
 
+# Health checks
+_ready_after: Optional[float] = None
+
+@app.get("/healthz")
+def healthz():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """
+    Readiness probe: every warehouse database is reachable and migrated to the
+    latest revision. While a chunked data migration runs the app serves reads,
+    so it reports ready with status "read_only" and the migration's progress,
+    as long as the models can read the schema the migration left behind.
+    """
+    global _ready_after
+    revisions = {}
+    data_migrations = {}
+    for warehouse in database.WAREHOUSES:
+        try:
+            revisions[warehouse] = database.get_schema_revision(warehouse)
+            progress = data_migration.get_progress(warehouse)
+        except Exception as e:
+            return JSONResponse(status_code=503, content={"status": "unavailable", "warehouse": warehouse, "detail": str(e)})
+        if progress:
+            data_migrations[warehouse] = progress
+
+    head = data_migration.get_head_revision()
+    behind = [warehouse for warehouse, revision in revisions.items() if revision != head]
+    if data_migrations and all(database.models_readable(warehouse) for warehouse in behind):
+        return {"status": "read_only", "revisions": revisions, "head": head, "data_migrations": data_migrations}
+    if behind:
+        content = {"status": "migrating", "revisions": revisions, "head": head}
+        if data_migrations:
+            content["data_migrations"] = data_migrations
+        return JSONResponse(status_code=503, content=content)
+
+    if _ready_after is None:
+        _ready_after = time.time() - STARTED_AT
+        logger.info("Ready %.2fs after start", _ready_after)
+    return {"status": "ready", "revision": head, "warehouses": database.WAREHOUSES,
+            "ready_after_seconds": round(_ready_after, 3)}
+
+@app.get("/api/metrics")
+def metrics():
+    """In-process counters for caches and admission control; reset when the process restarts"""
+    return {
+        "search_cache": search_cache.stats(),
+        "admission": {name: pool.stats() for name, pool in admission_pools.items()},
+    }
+
 # Frontend routes
 @app.get("/")
 async def read_root(request: Request):
@@ -57,11 +190,26 @@ def update_bin(bin_id: int, bin_update: database.BinUpdate, db: Session = Depend
     return db_bin
 
 @app.delete("/api/bins/{bin_id}")
-def delete_bin(bin_id: int, db: Session = Depends(get_db)):
-    db_bin = crud.delete_bin(db, bin_id=bin_id)
-    if db_bin is None:
+def delete_bin(bin_id: int, move_parts_to: Optional[int] = None, db: Session = Depends(get_db)):
+    """
+    Delete a bin. Its parts are moved to the bin with id `move_parts_to` when given,
+    otherwise they are deleted with it. Returns the number of parts moved or deleted.
+    """
+    if crud.get_bin(db, bin_id) is None:
+        raise HTTPException(status_code=404, detail="Bin not found")
+    if move_parts_to is not None:
+        if move_parts_to == bin_id:
+            raise HTTPException(status_code=400, detail="Cannot move parts into the bin being deleted")
+        if not crud.get_bin(db, move_parts_to):
+            raise HTTPException(status_code=400, detail="Target bin not found")
+        conflicts = crud.count_bin_move_conflicts(db, bin_id, move_parts_to)
+        if conflicts:
+            raise HTTPException(status_code=400, detail=f"{conflicts} parts already exist in the target bin")
+    
+    counts = crud.delete_bin(db, bin_id=bin_id, move_parts_to=move_parts_to)
+    if counts is None:
         raise HTTPException(status_code=404, detail="Bin not found")
-    return {"message": "Bin deleted successfully"}
+    return {"message": "Bin deleted successfully", **counts}
 
 # API Routes - Categories
 @app.get("/api/categories", response_model=List[database.CategoryRead])
@@ -75,6 +223,8 @@ def create_category(category: database.CategoryCreate, db: Session = Depends(get
     db_category = crud.get_category_by_name(db, category.name)
     if db_category:
         raise HTTPException(status_code=400, detail="Category name already exists")
+    if category.parent_id is not None and crud.get_category(db, category.parent_id) is None:
+        raise HTTPException(status_code=400, detail="Parent category not found")
     return crud.create_category(db=db, category=category)
 
 @app.get("/api/categories/{category_id}", response_model=database.CategoryWithParts)
@@ -86,6 +236,13 @@ def read_category(category_id: int, db: Session = Depends(get_db)):
 
 @app.put("/api/categories/{category_id}", response_model=database.CategoryRead)
 def update_category(category_id: int, category_update: database.CategoryUpdate, db: Session = Depends(get_db)):
+    parent_id = category_update.parent_id
+    if parent_id is not None:
+        if crud.get_category(db, parent_id) is None:
+            raise HTTPException(status_code=400, detail="Parent category not found")
+        # A category cannot be moved underneath itself or one of its descendants
+        if crud.is_category_in_subtree(db, root_id=category_id, category_id=parent_id):
+            raise HTTPException(status_code=400, detail="Category cannot be moved into its own subtree")
     db_category = crud.update_category(db, category_id=category_id, category_update=category_update)
     if db_category is None:
         raise HTTPException(status_code=404, detail="Category not found")
@@ -93,32 +250,25 @@ def update_category(category_id: int, category_update: database.CategoryUpdate,
 
 @app.delete("/api/categories/{category_id}")
 def delete_category(category_id: int, db: Session = Depends(get_db)):
-    db_category = crud.delete_category(db, category_id=category_id)
-    if db_category is None:
+    """Delete a category and unlink it from its parts; the parts are kept and subcategories move up a level"""
+    counts = crud.delete_category(db, category_id=category_id)
+    if counts is None:
         raise HTTPException(status_code=404, detail="Category not found")
-    return {"message": "Category deleted successfully"}
+    return {"message": "Category deleted successfully", **counts}
 
 # API Routes - Parts
 @app.get("/api/parts", response_model=List[database.PartRead])
 def read_parts(skip: int = 0, limit: int = 100, bin_id: Optional[int] = None, 
-               category_ids: Optional[List[int]] = Query(None), search: Optional[str] = None, 
-               db: Session = Depends(get_db)):
+               category_ids: Optional[List[int]] = Query(None), include_descendants: bool = False,
+               search: Optional[str] = None, db: Session = Depends(get_db)):
     if search:
         parts = crud.search_parts(db, search_term=search, skip=skip, limit=limit)
     else:
-        parts = crud.get_parts(db, skip=skip, limit=limit, bin_id=bin_id, category_ids=category_ids)
+        parts = crud.get_parts(db, skip=skip, limit=limit, bin_id=bin_id, category_ids=category_ids,
+                               include_descendants=include_descendants)
     return parts
 
-# Debug endpoint to test category filtering
-@app.get("/api/debug/parts")
-def debug_parts(category_ids: Optional[List[int]] = Query(None), db: Session = Depends(get_db)):
-    """Debug endpoint to test category filtering"""
-    parts = crud.get_parts(db, category_ids=category_ids, limit=1000)
-    return {
-        "category_ids": category_ids,
-        "parts_count": len(parts),
-        "parts": [{"id": p.id, "name": p.name, "categories": [c.name for c in p.categories]} for p in parts[:5]]
-    }
+DUPLICATE_PART_DETAIL = "A part with this name, manufacturer and model already exists in this bin"
 
 @app.post("/api/parts", response_model=database.PartRead)
 def create_part(part: database.PartCreate, db: Session = Depends(get_db)):
@@ -134,8 +284,24 @@ def create_part(part: database.PartCreate, db: Session = Depends(get_db)):
             if not db_category:
                 raise HTTPException(status_code=400, detail=f"Category with id {category_id} not found")
     
+    # Barcodes identify a single part
+    if part.barcode and crud.get_part_by_barcode(db, part.barcode):
+        raise HTTPException(status_code=400, detail="Barcode already assigned to another part")
+    
+    if crud.find_duplicate_part(db, part.name, part.manufacturer, part.model, part.bin_id):
+        raise HTTPException(status_code=400, detail=DUPLICATE_PART_DETAIL)
+    
     return crud.create_part(db=db, part=part)
 
+@app.post("/api/parts/lookup", response_model=database.PartLookupResult)
+def lookup_parts(lookup: database.PartLookupRequest, db: Session = Depends(get_db)):
+    """
+    Exact-match lookup of scanned codes against part barcodes and models.
+    Codes are normalized (spaces and dashes dropped, uppercased) and answered
+    from expression indexes; results are keyed by the code as sent.
+    """
+    return crud.lookup_parts(db, lookup.codes)
+
 @app.get("/api/parts/{part_id}", response_model=database.PartRead)
 def read_part(part_id: int, db: Session = Depends(get_db)):
     db_part = crud.get_part(db, part_id=part_id)
@@ -158,6 +324,21 @@ def update_part(part_id: int, part_update: database.PartUpdate, db: Session = De
             if not db_category:
                 raise HTTPException(status_code=400, detail=f"Category with id {category_id} not found")
     
+    if part_update.barcode:
+        existing = crud.get_part_by_barcode(db, part_update.barcode)
+        if existing and existing.id != part_id:
+            raise HTTPException(status_code=400, detail="Barcode already assigned to another part")
+    
+    db_part = crud.get_part(db, part_id=part_id)
+    if db_part is None:
+        raise HTTPException(status_code=404, detail="Part not found")
+    
+    # Check the identity the part will have after the update
+    merged = {**db_part.model_dump(), **part_update.model_dump(exclude_unset=True)}
+    existing = crud.find_duplicate_part(db, merged['name'], merged['manufacturer'], merged['model'], merged['bin_id'])
+    if existing and existing.id != part_id:
+        raise HTTPException(status_code=400, detail=DUPLICATE_PART_DETAIL)
+    
     db_part = crud.update_part(db, part_id=part_id, part_update=part_update)
     if db_part is None:
         raise HTTPException(status_code=404, detail="Part not found")
@@ -170,37 +351,229 @@ def delete_part(part_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Part not found")
     return {"message": "Part deleted successfully"}
 
-# CSV Import functionality
-@app.post("/api/import/csv")
-async def import_parts_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
+# API Routes - Pick lists
+@app.post("/api/picklist", response_model=database.PickList)
+def create_pick_list(pick_request: database.PickListRequest, db: Session = Depends(get_db)):
     """
-    Import parts from CSV file. Expected CSV columns:
-    name,description,quantity,part_type,specifications,manufacturer,model,bin_number,category_name
-    
-    bin_number will be used to find existing bins. If they don't exist, they will be created.
-    category_name can contain multiple categories separated by semicolons (e.g., "Electronics;Components").
-    Categories will be created if they don't exist.
+    Resolve a batch of part ids, models or names with quantities in a single query.
+    Returns picks grouped by bin in walk order (location, then bin number), plus
+    shortages and items that matched no part (by their index in `items`).
     """
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="File must be a CSV")
-    
+    return crud.resolve_pick_list(db, pick_request.items)
+
+# API Routes - Stock ledger
+@app.post("/api/parts/{part_id}/movements", response_model=database.StockMovementRead)
+def create_stock_movement(part_id: int, movement: database.StockMovementCreate, db: Session = Depends(get_db)):
+    """Adjust a part's quantity by `delta` (positive to receive, negative to consume)"""
+    db_movement = crud.adjust_part_quantity(db, part_id=part_id, delta=movement.delta, reason=movement.reason)
+    if db_movement is None:
+        if crud.get_part(db, part_id) is None:
+            raise HTTPException(status_code=404, detail="Part not found")
+        raise HTTPException(status_code=400, detail="Insufficient stock")
+    return db_movement
+
+@app.get("/api/parts/{part_id}/movements", response_model=database.StockHistory)
+def read_stock_history(part_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    return crud.get_part_stock_history(db, part_id=part_id, since=since, until=until, skip=skip, limit=limit)
+
+@app.get("/api/movements/summary", response_model=List[database.StockMovementSummary])
+def read_movement_summary(since: datetime, until: Optional[datetime] = None, skip: int = 0,
+                          limit: int = 100, db: Session = Depends(get_db)):
+    """Per-part stock in/out totals for the window [since, until)"""
+    until = until or datetime.now(timezone.utc)
+    return crud.get_movement_summary(db, since=since, until=until, skip=skip, limit=limit)
+
+@app.get("/api/low-stock", response_model=List[database.StockAlertRead])
+def read_low_stock(skip: int = 0, limit: int = Query(100, ge=1, le=10000), db: Session = Depends(get_db)):
+    """Parts at or below their reorder point, most recently raised first"""
+    return crud.get_stock_alerts(db, skip=skip, limit=limit)
+
+@app.post("/api/movements/compact")
+def compact_stock_movements(older_than_days: int = Query(LEDGER_RETENTION_DAYS, ge=0),
+                            warehouse: str = Depends(get_warehouse)):
+    """Fold movements older than `older_than_days` into per-part snapshots"""
+    return compact_ledger(warehouse, older_than_days)
+
+# API Routes - Backups
+@app.get("/api/admin/backups", response_model=List[database.BackupRead])
+def read_backups(warehouse: str = Depends(get_warehouse)):
+    return backup.list_backups(warehouse)
+
+@app.post("/api/admin/backups", response_model=database.BackupRead)
+def create_backup(warehouse: str = Depends(get_warehouse)):
+    """Take an online snapshot; writers are only paused for one short copy step at a time"""
     try:
-        # Read CSV content
-        content = await file.read()
-        csv_content = content.decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
-        
-        created_parts = []
-        errors = []
-        
-        for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 for header row
-            try:
-                # Get or create bin
-                bin_number = int(row.get('bin_number', 0))
-                if bin_number <= 0:
-                    errors.append(f"Row {row_num}: Invalid bin_number '{row.get('bin_number')}'")
-                    continue
-                    
+        return backup.create_backup(warehouse)
+    except backup.BackupInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/api/admin/backups/{name}/restore", response_model=database.BackupRead)
+def restore_backup(name: str, safety_backup: bool = True, warehouse: str = Depends(get_warehouse)):
+    """Replace the live database with a snapshot, backing up the current one first unless disabled"""
+    try:
+        restored = backup.restore_backup(name, warehouse, safety_backup=safety_backup)
+    except backup.BackupInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if restored is None:
+        raise HTTPException(status_code=404, detail="Backup not found")
+    search_cache.clear()
+    return restored
+
+# API Routes - Profiles
+@app.get("/api/admin/profiles")
+def read_profiles():
+    """Recently profiled requests, newest first"""
+    if not profiling.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    return [profile.summary() for profile in reversed(profiling.recent_profiles)]
+
+@app.get("/api/admin/profiles/{profile_id}")
+def read_profile(profile_id: str):
+    """A profiled request's SQL statements with timings and its slowest functions"""
+    profile = profiling.get_profile(profile_id) if profiling.PROFILING_ENABLED else None
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.report()
+
+# API Routes - Warehouses
+@app.get("/api/warehouses", response_model=List[str])
+def read_warehouses():
+    """Configured warehouse keys; the first one serves requests that don't name a warehouse"""
+    return database.WAREHOUSES
+
+async def _fan_out(query, *args) -> dict:
+    """Run `query(warehouse, *args)` on every warehouse in parallel, keyed by warehouse"""
+    results = await asyncio.gather(
+        *(run_in_threadpool(query, warehouse, *args) for warehouse in database.WAREHOUSES)
+    )
+    return dict(zip(database.WAREHOUSES, results))
+
+def _search_warehouse(warehouse: str, search: str, limit: int) -> List[database.WarehousePartRead]:
+    with warehouse_session(warehouse) as db:
+        return [
+            database.WarehousePartRead.model_validate(part, update={"warehouse": warehouse})
+            for part in crud.search_parts(db, search, limit=limit, order_by_name=True)
+        ]
+
+def _warehouse_stock(warehouse: str, search: str) -> dict:
+    with warehouse_session(warehouse) as db:
+        return crud.get_stock_totals(db, search)
+
+@app.get("/api/warehouses/search", response_model=List[database.WarehousePartRead])
+async def search_warehouses(search: str = Query(..., min_length=1), limit: int = Query(100, ge=1, le=1000)):
+    """Search every warehouse at once; matches are merged by name, tagged with their warehouse"""
+    # Each warehouse returns its first `limit` matches by name, so the merge
+    # holds the first `limit` overall
+    results = await _fan_out(_search_warehouse, search, limit)
+    parts = [part for warehouse_parts in results.values() for part in warehouse_parts]
+    parts.sort(key=lambda part: (crud.name_sort_key(part.name), part.warehouse, part.id))
+    return parts[:limit]
+
+@app.get("/api/warehouses/stock", response_model=database.StockTotals)
+async def read_stock_totals(search: str = Query(..., min_length=1)):
+    """Part count and total quantity of parts matching the search, per warehouse and overall"""
+    results = await _fan_out(_warehouse_stock, search)
+    warehouses = [database.WarehouseStock(warehouse=warehouse, **totals) for warehouse, totals in results.items()]
+    return database.StockTotals(
+        warehouses=warehouses,
+        part_count=sum(stock.part_count for stock in warehouses),
+        quantity=sum(stock.quantity for stock in warehouses),
+    )
+
+# API Routes - Change feed
+CHANGE_STREAM_POLL_SECONDS = 1.0
+CHANGE_STREAM_HEARTBEAT_SECONDS = 15.0
+
+@app.get("/api/changes", response_model=database.ChangeFeed)
+def read_changes(since: int = 0, limit: int = Query(1000, ge=1, le=10000), db: Session = Depends(get_db)):
+    """
+    Incremental sync. Returns changes made after the `since` token, oldest first.
+    Pass the returned `next_token` as `since` on the next call; keep calling while
+    `has_more` is true. Deletes are returned as tombstones (op "delete", no data).
+    """
+    changes = crud.get_changes(db, since=since, limit=limit + 1)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    next_token = changes[-1].id if changes else since
+    return database.ChangeFeed(changes=changes, next_token=next_token, has_more=has_more)
+
+def _fetch_changes(warehouse: str, since: int, limit: int) -> List[database.ChangeRead]:
+    with warehouse_session(warehouse) as db:
+        return crud.get_changes(db, since=since, limit=limit)
+
+def _latest_change_id(warehouse: str) -> int:
+    with warehouse_session(warehouse) as db:
+        return crud.get_latest_change_id(db)
+
+@app.get("/api/changes/stream")
+async def stream_changes(request: Request, since: Optional[int] = None, warehouse: str = Depends(get_warehouse)):
+    """
+    Server-Sent Events stream of the change feed. Starts after `since` (or the
+    Last-Event-ID header when reconnecting); without either, only new changes are sent.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    if since is None:
+        since = await run_in_threadpool(_latest_change_id, warehouse)
+
+    async def event_stream():
+        token = since
+        idle = 0.0
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            changes = await run_in_threadpool(_fetch_changes, warehouse, token, 500)
+            for change in changes:
+                yield f"id: {change.id}\nevent: change\ndata: {change.model_dump_json()}\n\n"
+                token = change.id
+            if changes:
+                idle = 0.0
+                continue
+            await asyncio.sleep(CHANGE_STREAM_POLL_SECONDS)
+            idle += CHANGE_STREAM_POLL_SECONDS
+            if idle >= CHANGE_STREAM_HEARTBEAT_SECONDS:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# CSV Import functionality
+def _import_rows(db: Session, csv_reader: csv.DictReader, mode: str, digest: str) -> dict:
+    if mode == "upsert":
+        previous = crud.get_unchanged_import(db, digest)
+        if previous:
+            return {
+                "message": f"Import completed. 0 parts created, 0 updated, {previous.rows} unchanged.",
+                "inserted": 0,
+                "updated": 0,
+                "unchanged": previous.rows,
+                "errors": json.loads(previous.errors or "[]")
+            }
+    
+    created_parts = []
+    upserts = []
+    errors = []
+    
+    # Bins and categories repeat across rows, so resolve each one only once
+    bin_ids = {}
+    category_ids_by_name = {}
+    
+    for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 for header row
+        try:
+            # Get or create bin
+            bin_number = int(row.get('bin_number', 0))
+            if bin_number <= 0:
+                errors.append(f"Row {row_num}: Invalid bin_number '{row.get('bin_number')}'")
+                continue
+            
+            if bin_number not in bin_ids:
                 db_bin = crud.get_bin_by_number(db, bin_number)
                 if not db_bin:
                     # Create bin with basic info
@@ -209,14 +582,16 @@ async def import_parts_csv(file: UploadFile = File(...), db: Session = Depends(g
                         description=f"Auto-created bin {bin_number}"
                     )
                     db_bin = crud.create_bin(db, bin_create)
-                
-                # Get or create categories (can be multiple, separated by semicolons)
-                category_ids = []
-                category_names = row.get('category_name', '').strip()
-                if category_names:
-                    for category_name in category_names.split(';'):
-                        category_name = category_name.strip()
-                        if category_name:
+                bin_ids[bin_number] = db_bin.id
+            
+            # Get or create categories (can be multiple, separated by semicolons)
+            category_ids = []
+            category_names = row.get('category_name', '').strip()
+            if category_names:
+                for category_name in category_names.split(';'):
+                    category_name = category_name.strip()
+                    if category_name:
+                        if category_name not in category_ids_by_name:
                             db_category = crud.get_category_by_name(db, category_name)
                             if not db_category:
                                 category_create = database.CategoryCreate(
@@ -224,38 +599,92 @@ async def import_parts_csv(file: UploadFile = File(...), db: Session = Depends(g
                                     description=f"Auto-created category {category_name}"
                                 )
                                 db_category = crud.create_category(db, category_create)
-                            category_ids.append(db_category.id)
-                
-                # Create part
-                part_data = database.PartCreate(
-                    name=row.get('name', '').strip(),
-                    description=row.get('description', '').strip() or None,
-                    quantity=int(row.get('quantity', 1)),
-                    part_type=row.get('part_type', '').strip() or None,
-                    specifications=row.get('specifications', '').strip() or None,
-                    manufacturer=row.get('manufacturer', '').strip() or None,
-                    model=row.get('model', '').strip() or None,
-                    bin_id=db_bin.id,
-                    category_ids=category_ids
-                )
-                
-                if not part_data.name:
-                    errors.append(f"Row {row_num}: Part name is required")
-                    continue
-                
-                created_part = crud.create_part(db, part_data)
-                created_parts.append(created_part.name)
-                
-            except ValueError as e:
-                errors.append(f"Row {row_num}: Invalid data - {str(e)}")
-            except Exception as e:
-                errors.append(f"Row {row_num}: {str(e)}")
-        
+                            category_ids_by_name[category_name] = db_category.id
+                        category_ids.append(category_ids_by_name[category_name])
+            
+            # Create part
+            part_data = database.PartCreate(
+                name=row.get('name', '').strip(),
+                description=row.get('description', '').strip() or None,
+                quantity=int(row.get('quantity', 1)),
+                part_type=row.get('part_type', '').strip() or None,
+                specifications=row.get('specifications', '').strip() or None,
+                manufacturer=row.get('manufacturer', '').strip() or None,
+                model=row.get('model', '').strip() or None,
+                barcode=(row.get('barcode') or '').strip() or None,
+                bin_id=bin_ids[bin_number],
+                category_ids=category_ids
+            )
+            
+            if not part_data.name:
+                errors.append(f"Row {row_num}: Part name is required")
+                continue
+            
+            if mode == "upsert":
+                upserts.append(part_data)
+                continue
+            
+            if crud.find_duplicate_part(db, part_data.name, part_data.manufacturer, part_data.model, part_data.bin_id):
+                errors.append(f"Row {row_num}: Part '{part_data.name}' already exists in bin {bin_number}")
+                continue
+            
+            if part_data.barcode and crud.get_part_by_barcode(db, part_data.barcode):
+                errors.append(f"Row {row_num}: Barcode '{part_data.barcode}' already assigned to another part")
+                continue
+            
+            created_part = crud.create_part(db, part_data)
+            created_parts.append(created_part.name)
+            
+        except ValueError as e:
+            errors.append(f"Row {row_num}: Invalid data - {str(e)}")
+        except Exception as e:
+            errors.append(f"Row {row_num}: {str(e)}")
+    
+    if mode == "upsert":
+        counts = crud.upsert_parts(db, upserts)
+        errors.extend(f"Barcode '{barcode}' already assigned to another part" for barcode in counts.pop("conflicts"))
+        crud.record_import_run(db, digest, rows=counts["inserted"] + counts["updated"] + counts["unchanged"],
+                               errors=errors)
         return {
-            "message": f"Import completed. {len(created_parts)} parts created.",
-            "created_parts": created_parts,
+            "message": (f"Import completed. {counts['inserted']} parts created, "
+                        f"{counts['updated']} updated, {counts['unchanged']} unchanged."),
+            **counts,
             "errors": errors
         }
+    
+    return {
+        "message": f"Import completed. {len(created_parts)} parts created.",
+        "created_parts": created_parts,
+        "errors": errors
+    }
+
+@app.post("/api/import/csv")
+async def import_parts_csv(file: UploadFile = File(...), mode: str = Query("create", pattern="^(create|upsert)$"),
+                           db: Session = Depends(get_db)):
+    """
+    Import parts from CSV file. Expected CSV columns:
+    name,description,quantity,part_type,specifications,manufacturer,model,barcode,bin_number,category_name
+    
+    bin_number will be used to find existing bins. If they don't exist, they will be created.
+    category_name can contain multiple categories separated by semicolons (e.g., "Electronics;Components").
+    Categories will be created if they don't exist.
+    
+    mode=create (default) adds every row and reports rows that duplicate an existing part
+    (same name, manufacturer and model in the same bin). mode=upsert updates those parts
+    instead, skips unchanged rows and reports inserted/updated/unchanged counts.
+    """
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="File must be a CSV")
+    
+    try:
+        # Read CSV content
+        content = await file.read()
+        csv_content = content.decode('utf-8')
+        csv_reader = csv.DictReader(io.StringIO(csv_content))
+        digest = hashlib.sha256(content).hexdigest()
+        
+        # Keep the database work off the event loop
+        return await run_in_threadpool(_import_rows, db, csv_reader, mode, digest)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing CSV: {str(e)}")
@@ -263,8 +692,6 @@ async def import_parts_csv(file: UploadFile = File(...), db: Session = Depends(g
 @app.get("/api/export/csv")
 def export_parts_csv(db: Session = Depends(get_db)):
     """Export all parts to CSV format"""
-    from fastapi.responses import StreamingResponse
-    
     parts = crud.get_parts(db, limit=10000)  # Get all parts
     
     output = io.StringIO()
@@ -272,8 +699,8 @@ def export_parts_csv(db: Session = Depends(get_db)):
     
     # Write header
     writer.writerow([
-        'name', 'description', 'quantity', 'part_type', 'specifications', 
-        'manufacturer', 'model', 'bin_number', 'category_name'
+        'name', 'quantity', 'part_type', 'specifications', 
+        'manufacturer', 'model', 'barcode', 'bin_number', 'category_name'
     ])
     
     # Write data
@@ -282,12 +709,12 @@ def export_parts_csv(db: Session = Depends(get_db)):
         category_names = ';'.join([category.name for category in part.categories]) if part.categories else ''
         writer.writerow([
             part.name,
-            part.description or '',
             part.quantity,
             part.part_type or '',
             part.specifications or '',
             part.manufacturer or '',
             part.model or '',
+            part.barcode or '',
             part.bin.number,
             category_names
         ])
@@ -300,6 +727,23 @@ def export_parts_csv(db: Session = Depends(get_db)):
         headers={"Content-Disposition": "attachment; filename=parts_export.csv"}
     )
 
+def _columnar_export(format: str, warehouse: str) -> StreamingResponse:
+    return StreamingResponse(
+        export.stream_parts(format, warehouse=warehouse),
+        media_type=export.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename=parts_export.{format}"}
+    )
+
+@app.get("/api/export/arrow")
+def export_parts_arrow(warehouse: str = Depends(get_warehouse)):
+    """Export all parts with bin number and categories as an Arrow IPC stream"""
+    return _columnar_export("arrow", warehouse)
+
+@app.get("/api/export/parquet")
+def export_parts_parquet(warehouse: str = Depends(get_warehouse)):
+    """Export all parts with bin number and categories as a Parquet file"""
+    return _columnar_export("parquet", warehouse)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -21,6 +21,7 @@ const closeModal = document.querySelector('.close');
 document.addEventListener('DOMContentLoaded', async function() {
     initializeEventListeners();
     await loadInitialData();
+    subscribeToChanges();
 });
 
 // Event listeners
@@ -91,6 +92,37 @@ async function loadInitialData() {
     }
 }
 
+// Live updates: reload the current view when the server reports changes
+let changeReloadTimer = null;
+
+function subscribeToChanges() {
+    if (!window.EventSource) return;
+
+    const source = new EventSource(`${API_BASE}/changes/stream`);
+    source.addEventListener('change', () => {
+        // Coalesce bursts (e.g. CSV imports) into a single reload
+        clearTimeout(changeReloadTimer);
+        changeReloadTimer = setTimeout(reloadCurrentView, 500);
+    });
+}
+
+function reloadCurrentView() {
+    // Don't pull data out from under an open form
+    if (modal.style.display === 'block') return;
+
+    switch(currentView) {
+        case 'parts':
+            loadParts();
+            break;
+        case 'bins':
+            loadBins();
+            break;
+        case 'categories':
+            loadCategories();
+            break;
+    }
+}
+
 // View switching
 function switchView(viewName) {
     currentView = viewName;
@@ -426,7 +458,11 @@ function applyFilters() {
     
     currentFilters = {};
     if (binId) currentFilters.bin_id = binId;
-    if (categoryId) currentFilters.category_ids = [categoryId];
+    if (categoryId) {
+        // Filtering by a category also matches parts in its subcategories
+        currentFilters.category_ids = [categoryId];
+        currentFilters.include_descendants = true;
+    }
     
     console.log('Applying filters:', currentFilters); // Debug log
     
@@ -481,10 +517,22 @@ async function showPartForm(partId = null) {
                     <label for="part-model">Model</label>
                     <input type="text" id="part-model" value="${part ? escapeHtml(part.model || '') : ''}">
                 </div>
+                <div class="form-group">
+                    <label for="part-barcode">Barcode</label>
+                    <input type="text" id="part-barcode" value="${part ? escapeHtml(part.barcode || '') : ''}">
+                </div>
                 <div class="form-group">
                     <label for="part-quantity">Quantity *</label>
                     <input type="number" id="part-quantity" value="${part ? part.quantity : 1}" min="0" required>
                 </div>
+                <div class="form-group">
+                    <label for="part-reorder-point">Reorder Point</label>
+                    <input type="number" id="part-reorder-point" value="${part && part.reorder_point !== null ? part.reorder_point : ''}" min="0">
+                </div>
+                <div class="form-group">
+                    <label for="part-reorder-quantity">Reorder Quantity</label>
+                    <input type="number" id="part-reorder-quantity" value="${part && part.reorder_quantity !== null ? part.reorder_quantity : ''}" min="1">
+                </div>
                 <div class="form-group">
                     <label for="part-bin">Bin *</label>
                     <select id="part-bin" required>
@@ -581,13 +629,15 @@ async function showBinForm(binId = null) {
 
 async function showCategoryForm(categoryId = null) {
     let category = null;
-    if (categoryId) {
-        try {
+    let categories = [];
+    try {
+        categories = await API.getCategories();
+        if (categoryId) {
             category = await API.getCategory(categoryId);
-        } catch (error) {
-            showError('Failed to load category data: ' + error.message);
-            return;
         }
+    } catch (error) {
+        showError('Failed to load category data: ' + error.message);
+        return;
     }
     
     modalBody.innerHTML = `
@@ -601,6 +651,17 @@ async function showCategoryForm(categoryId = null) {
                 <label for="category-description">Description</label>
                 <textarea id="category-description">${category ? escapeHtml(category.description || '') : ''}</textarea>
             </div>
+            <div class="form-group">
+                <label for="category-parent">Parent Category</label>
+                <select id="category-parent">
+                    <option value="">None (top level)</option>
+                    ${categories.filter(c => c.id !== categoryId).map(c => `
+                        <option value="${c.id}" ${category && category.parent_id === c.id ? 'selected' : ''}>
+                            ${escapeHtml(c.name)}
+                        </option>
+                    `).join('')}
+                </select>
+            </div>
             <div class="form-actions">
                 <button type="button" class="btn-secondary" onclick="hideModal()">Cancel</button>
                 <button type="submit" class="btn-primary">${categoryId ? 'Update' : 'Create'}</button>
@@ -629,7 +690,10 @@ async function savePart(partId = null) {
             specifications: document.getElementById('part-specifications').value.trim() || null,
             manufacturer: document.getElementById('part-manufacturer').value.trim() || null,
             model: document.getElementById('part-model').value.trim() || null,
+            barcode: document.getElementById('part-barcode').value.trim() || null,
             quantity: parseInt(document.getElementById('part-quantity').value),
+            reorder_point: parseOptionalInt(document.getElementById('part-reorder-point').value),
+            reorder_quantity: parseOptionalInt(document.getElementById('part-reorder-quantity').value),
             bin_id: parseInt(document.getElementById('part-bin').value),
             category_ids: categoryIds,
         };
@@ -682,6 +746,7 @@ async function saveCategory(categoryId = null) {
         const formData = {
             name: document.getElementById('category-name').value.trim(),
             description: document.getElementById('category-description').value.trim() || null,
+            parent_id: parseInt(document.getElementById('category-parent').value) || null,
         };
         
         if (categoryId) {
@@ -769,6 +834,11 @@ function escapeHtml(text) {
     return div.innerHTML;
 }
 
+function parseOptionalInt(value) {
+    // Empty inputs clear the field instead of sending NaN
+    return value.trim() === '' ? null : parseInt(value);
+}
+
 function showSuccess(message) {
     showFlashMessage(message, 'success');
 }
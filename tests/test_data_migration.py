@@ -0,0 +1,139 @@
+import os
+import sqlite3
+
+import pytest
+from alembic import command, op
+from alembic.config import Config
+
+from backend import data_migration, database
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BEFORE = "f586964f213f"
+CONVERT = "137f476c8392"
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "parts_inventory.db")
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{path}")
+    monkeypatch.setattr(database, "WAREHOUSES", [database.DEFAULT_WAREHOUSE])
+    monkeypatch.setattr(data_migration, "DATA_MIGRATION_CHECK_SECONDS", 0)
+    return path
+
+
+@pytest.fixture
+def alembic_config():
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    return config
+
+
+def _seed(path, parts=50):
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("INSERT INTO bins (id, number, created_at) VALUES (1, 1, '2026-01-01 00:00:00')")
+        connection.execute("INSERT INTO categories (id, name, created_at) VALUES (1, 'Passive', '2026-01-01 00:00:00')")
+        connection.executemany(
+            "INSERT INTO parts (id, name, quantity, bin_id, category_id, created_at, updated_at) "
+            "VALUES (?, ?, 1, 1, ?, '2026-01-01 00:00:00', '2026-01-01 00:00:00')",
+            [(part_id, f"Part {part_id}", 1 if part_id % 2 else None) for part_id in range(1, parts + 1)],
+        )
+    connection.close()
+
+
+def _query(path, sql):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(sql).fetchall()
+    finally:
+        connection.close()
+
+
+def _tables(path):
+    return {name for (name,) in _query(path, "SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _interrupt_after_drop(monkeypatch):
+    execute = op.execute
+
+    def interrupting_execute(sql, *args, **kwargs):
+        execute(sql, *args, **kwargs)
+        if str(sql).strip() == "DROP TABLE parts":
+            raise Interrupted()
+
+    monkeypatch.setattr(op, "execute", interrupting_execute)
+
+
+def _assert_converted(path, parts=50):
+    assert _query(path, "SELECT version_num FROM alembic_version") == [(CONVERT,)]
+    assert _query(path, "SELECT count(*) FROM parts") == [(parts,)]
+    assert _query(path, "SELECT count(*) FROM part_categories") == [((parts + 1) // 2,)]
+    assert "category_id" not in {row[1] for row in _query(path, "PRAGMA table_info(parts)")}
+    assert "ix_parts_name" in {row[1] for row in _query(path, "PRAGMA index_list(parts)")}
+    assert not _tables(path) & {"parts_new", data_migration.CHECKPOINT_TABLE}
+
+
+def test_interrupted_swap_rolls_back_and_resumes(db_path, alembic_config, monkeypatch):
+    command.upgrade(alembic_config, BEFORE)
+    _seed(db_path)
+
+    with monkeypatch.context() as patch:
+        _interrupt_after_drop(patch)
+        with pytest.raises(Interrupted):
+            command.upgrade(alembic_config, CONVERT)
+
+    # The drop was rolled back with the rest of the swap
+    assert {"parts", "parts_new", data_migration.CHECKPOINT_TABLE} <= _tables(db_path)
+    assert _query(db_path, "SELECT version_num FROM alembic_version") == [(BEFORE,)]
+
+    command.upgrade(alembic_config, CONVERT)
+    _assert_converted(db_path)
+
+
+def test_resumes_after_parts_was_dropped(db_path, alembic_config, monkeypatch):
+    command.upgrade(alembic_config, BEFORE)
+    _seed(db_path)
+    with monkeypatch.context() as patch:
+        _interrupt_after_drop(patch)
+        with pytest.raises(Interrupted):
+            command.upgrade(alembic_config, CONVERT)
+
+    # What a run that committed the drop on its own left behind
+    connection = sqlite3.connect(db_path)
+    connection.execute("DROP TABLE parts")
+    connection.close()
+
+    command.upgrade(alembic_config, CONVERT)
+    _assert_converted(db_path)
+
+
+def test_resumes_after_unstamped_swap(db_path, alembic_config):
+    command.upgrade(alembic_config, BEFORE)
+    _seed(db_path)
+    command.upgrade(alembic_config, CONVERT)
+
+    # The swap committed but the revision stamp didn't
+    connection = sqlite3.connect(db_path)
+    with connection:
+        connection.execute(f"UPDATE alembic_version SET version_num = '{BEFORE}'")
+    connection.close()
+
+    command.upgrade(alembic_config, CONVERT)
+    _assert_converted(db_path)
+
+
+def test_downgrade_and_upgrade_again(db_path, alembic_config):
+    command.upgrade(alembic_config, BEFORE)
+    _seed(db_path)
+    command.upgrade(alembic_config, CONVERT)
+    command.downgrade(alembic_config, BEFORE)
+
+    assert _query(db_path, "SELECT count(*) FROM parts WHERE category_id IS NOT NULL") == [(25,)]
+    assert not _tables(db_path) & {"part_categories", "parts_new", data_migration.CHECKPOINT_TABLE}
+
+    command.upgrade(alembic_config, CONVERT)
+    _assert_converted(db_path)